@@ -0,0 +1,21 @@
+import hmac
+import os
+
+from fastapi import HTTPException, Request
+
+# ----------------------------------------------------------------------
+# Admin-Zugang für interne Endpunkte (Profiling, Produktion, Reporting)
+# Ohne gesetztes SHOP_ADMIN_TOKEN sind diese Endpunkte abgeschaltet.
+# Das Token wird im Header X-Admin-Token mitgeschickt.
+# ----------------------------------------------------------------------
+
+ADMIN_TOKEN = os.environ.get("SHOP_ADMIN_TOKEN")
+
+
+def require_admin(request: Request):
+    """FastAPI-Dependency: ohne Token ist die Funktion abgeschaltet (404), sonst 403 bei falschem Token."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Ungültiges Admin-Token.")
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from compression import COMPRESSIBLE_TYPES, BrotliCompressor, GzipCompressor, brotli
+
+# ----------------------------------------------------------------------
+# Benchmark: eingesparte Bytes vs. CPU-Kosten der Kompression pro Route
+# Holt die unkomprimierten Antworten der wichtigsten Routen in-process
+# (Warenkorb mit mehreren Positionen, Upload mit Testbild) und misst für
+# jede Kodierung Größe und Kompressionszeit pro Antwort.
+#
+# Aufruf (aus src/):  python bench_compression.py --cart-lines 10
+# ----------------------------------------------------------------------
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///bench.db"
+
+
+def encoders() -> List[Tuple[str, object]]:
+    """(Bezeichnung, Fabrik) aller zu vergleichenden Kodierungen."""
+    result = [
+        ("gzip-1", lambda: GzipCompressor(level=1)),
+        ("gzip-6", lambda: GzipCompressor(level=6)),
+    ]
+    if brotli is not None:
+        result += [
+            ("br-4", lambda: BrotliCompressor(quality=4)),
+            ("br-11", lambda: BrotliCompressor(quality=11)),
+        ]
+    return result
+
+
+async def fetch_bodies(cart_lines: int) -> Dict[str, Tuple[str, bytes]]:
+    """Unkomprimierte Antworten (Content-Type, Body) pro Route."""
+    from loadtest import make_test_image
+    from main import app
+
+    bodies = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        headers = {"accept-encoding": "identity"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            for i in range(cart_lines):
+                await client.post("/order", data={
+                    "size": "mittel", "shape": "herz", "filling": f"Füllung {i}",
+                    "toppings": "Goldstaub", "quantity": str(1 + i % 12), "old_brownies_qty": str(i % 2),
+                })
+            for route in ("/welcome", "/shop", "/cart", "/checkout"):
+                response = await client.get(route)
+                bodies[f"GET {route}"] = (response.headers.get("content-type", ""), response.content)
+
+            response = await client.post("/upload", files={"file": ("motiv.png", make_test_image(512), "image/png")})
+            bodies["POST /upload"] = (response.headers.get("content-type", ""), response.content)
+    return bodies
+
+
+def measure(body: bytes, factory, repeat: int) -> Tuple[int, float]:
+    """Komprimierte Größe und mittlere CPU-Zeit (ms) pro Antwort."""
+    compressed = factory().finish(body)
+    started = time.process_time()
+    for _ in range(repeat):
+        factory().finish(body)
+    return len(compressed), (time.process_time() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kompression pro Route: Bytes gespart vs. CPU-Zeit.")
+    parser.add_argument("--cart-lines", type=int, default=10, help="Positionen im Warenkorb für /cart und /checkout")
+    parser.add_argument("--repeat", type=int, default=50, help="Wiederholungen pro Messung")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SHOP_DATABASE_URL", DEFAULT_DATABASE_URL)
+    bodies = asyncio.run(fetch_bodies(args.cart_lines))
+
+    print(f"{'Route':<16}{'Kodierung':<10}{'Roh':>10}{'Komprimiert':>13}{'Gespart':>9}{'CPU ms':>9}")
+    for route, (content_type, body) in bodies.items():
+        if content_type.split(";")[0].strip() not in COMPRESSIBLE_TYPES:
+            print(f"{route:<16}{'-':<10}{len(body):>10}  (Typ {content_type} wird nicht komprimiert)")
+            continue
+        for name, factory in encoders():
+            size, cpu_ms = measure(body, factory, args.repeat)
+            saved = 100 * (1 - size / max(len(body), 1))
+            print(f"{route:<16}{name:<10}{len(body):>10}{size:>13}{saved:>8.1f}%{cpu_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+import uuid
+from base64 import b64decode
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.middleware.sessions import SessionMiddleware
+
+from functions import calculate_totals, enrich_cart_item_prices, format_currency, render_cart_items_html
+
+# ----------------------------------------------------------------------
+# Microbenchmarks für die Hot Paths jeder Warenkorb-Interaktion
+# Preisberechnung, Summen, Währungsformat, HTML der Positionen und das
+# (De-)Serialisieren des signierten Session-Cookies – jeweils für
+# Warenkörbe mit 1 bis 1000 Positionen. Gemessen werden ops/s (timeit,
+# bester von mehreren Durchläufen, dazu dessen Rauschen) und der
+# Spitzenspeicher pro Aufruf (tracemalloc). Mit --baseline wird gegen
+# einen gespeicherten Stand verglichen; Regressionen beenden mit Exit-Code 1.
+# Als Regression zählt nur, was über dem Schwellwert plus dem Rauschen
+# beider Bestwerte (gedeckelt durch --max-noise) liegt und auch absolut
+# (--min-delta-us bzw. --min-alloc-delta) ins Gewicht fällt. Auffällige
+# Benchmarks werden vor der Meldung bis zu --confirm-mal nachgemessen (der
+# beste Wert zählt), damit eine kurze Phase mit langsamer Maschine keine
+# Regression vortäuscht.
+#
+# session_decode misst nur Signaturprüfung, Base64 und JSON des Cookies,
+# session_roundtrip einen Request mit Cookie durch die SessionMiddleware
+# (Laden plus erneutes Signieren beim Antworten, wie bei jedem Seitenaufruf).
+#
+# Aufruf (aus src/):
+#   python bench_hotpaths.py --save-baseline bench_hotpaths_baseline.json
+#   python bench_hotpaths.py --baseline bench_hotpaths_baseline.json --max-regression 25
+# Baselines sind maschinenabhängig und werden daher nicht eingecheckt.
+# ----------------------------------------------------------------------
+
+DEFAULT_LINES = "1,10,100,1000"
+SESSION_COOKIE = "fancy_brownie_session"
+BENCH_SECRET_KEY = "bench-secret-key"
+
+
+def make_cart(lines: int, seed: int = 1) -> List[Dict]:
+    """Session-Warenkorb wie ihn /order anlegt: überwiegend Wunsch-Brownies, einige Second-Chance."""
+    rng = random.Random(seed)
+    cart = []
+    for i in range(lines):
+        if i % 5 == 4:
+            cart.append({
+                "session_item_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "product_id": 2,
+                "quantity": rng.choice([1, 2, 4]),
+                "size": "zufällig", "shape": "zufällig", "filling": "zufällig", "toppings": "keine",
+            })
+            continue
+        cart.append({
+            "session_item_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "product_id": 1,
+            "quantity": rng.choice([1, 2, 3, 5, 10, 12]),
+            "size": rng.choice(["klein", "mittel", "groß"]),
+            "shape": rng.choice(["quadrat", "rund", "herz"]),
+            "filling": rng.choice(["", "Nougat", "Gesalzenes Karamell"]),
+            "toppings": rng.choice(["", "Goldstaub", "Mandeln, Streusel"]),
+            "engraving_original_hash": None,
+            "engraving_mask_hash": None,
+        })
+    return cart
+
+
+# ----------------------------------------------------------------------
+# Session-Cookie über die echte SessionMiddleware mit Dummy-App
+# ----------------------------------------------------------------------
+
+class SessionRoundtrip:
+    """Treibt die SessionMiddleware direkt über ASGI, ohne HTTP-Server und Routing."""
+
+    def __init__(self, cart: List[Dict]):
+        self.cart = cart
+        self.loaded: Optional[Dict] = None
+        self.middleware = SessionMiddleware(self._app, secret_key=BENCH_SECRET_KEY, session_cookie=SESSION_COOKIE)
+        self.loop = asyncio.new_event_loop()
+        self.cookie_header = self._set_cookie_value()
+        self.cookie_value = self.cookie_header.split(b"=", 1)[1]
+
+    async def _app(self, scope, receive, send):
+        if scope["path"] == "/write":
+            scope["session"]["cart"] = self.cart
+        else:
+            self.loaded = scope["session"].get("cart")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _receive(self):
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    def _call(self, path: str, cookie: Optional[bytes]) -> List[Dict]:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        headers = [(b"cookie", cookie)] if cookie else []
+        scope = {"type": "http", "method": "GET", "path": path, "headers": headers}
+        self.loop.run_until_complete(self.middleware(scope, self._receive, send))
+        return messages
+
+    def _set_cookie_value(self) -> bytes:
+        for name, value in self._call("/write", None)[0]["headers"]:
+            if name == b"set-cookie":
+                return value.split(b";", 1)[0]
+        raise RuntimeError("SessionMiddleware hat kein Cookie gesetzt.")
+
+    def encode(self):
+        """Warenkorb in die Session schreiben: JSON, Base64, Signatur, Set-Cookie."""
+        self._call("/write", None)
+
+    def roundtrip(self):
+        """Request mit Cookie: prüfen, laden – und beim Antworten neu signieren."""
+        self._call("/read", self.cookie_header)
+
+    def decode(self):
+        """Nur den Ladepfad der Middleware: Signatur prüfen, Base64, JSON."""
+        data = self.middleware.signer.unsign(self.cookie_value, max_age=self.middleware.max_age)
+        return json.loads(b64decode(data))
+
+    def close(self):
+        self.loop.close()
+
+
+# ----------------------------------------------------------------------
+# Benchmarks und Messung
+# ----------------------------------------------------------------------
+
+def build_cases(lines: int) -> Tuple[List[Tuple[str, Callable]], SessionRoundtrip]:
+    """(Name, Aufruf) je Hot Path für einen Warenkorb, dazu der Session-Treiber (zum Schließen)."""
+    cart = make_cart(lines)
+    enriched = [enrich_cart_item_prices(dict(item)) for item in cart]
+    # enrich_cart_item_prices ändert die Session-Items in place – der echte Cookie enthält die Preisfelder
+    session = SessionRoundtrip(enriched)
+    cases = [
+        ("enrich_cart_item_prices", lambda: [enrich_cart_item_prices(item) for item in cart]),
+        ("calculate_totals", lambda: calculate_totals(enriched)),
+        ("format_currency", lambda: [format_currency(item["total_item_price"]) for item in enriched]),
+        ("render_cart_items_html", lambda: render_cart_items_html(enriched)),
+        ("session_encode", session.encode),
+        ("session_decode", session.decode),
+        ("session_roundtrip", session.roundtrip),
+    ]
+    return cases, session
+
+
+def measure(func: Callable, repeat: int) -> Dict[str, float]:
+    """
+    Beste ops/s aus `repeat` Läufen (Störungen machen Läufe nur langsamer),
+    das Rauschen dieses Bestwerts und den Spitzenspeicher eines einzelnen
+    Aufrufs. Rauschen = Abstand des schnellsten zum drittschnellsten Lauf
+    in Prozent: so weit ist der Bestwert selbst reproduzierbar.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    per_call = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    best = per_call[0]
+    runner_up = per_call[min(2, len(per_call) - 1)]
+
+    func()  # Caches/Lazy-Initialisierung nicht als Allokation zählen
+    tracemalloc.start()
+    try:
+        baseline_bytes, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops_per_sec": 1 / best,
+        "noise_pct": 100 * (runner_up - best) / best,
+        "peak_bytes": peak_bytes - baseline_bytes,
+    }
+
+
+def run_benchmarks(line_counts: List[int], repeat: int, only: Optional[str]) -> Dict[str, Dict[str, float]]:
+    results = {}
+    print(f"{'Benchmark':<26}{'Zeilen':>7}{'ops/s':>13}{'µs/op':>12}{'±%':>7}{'Peak KiB':>11}")
+    # calculate_totals gibt pro Aufruf eine Zeile aus – beim Messen verwerfen
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for lines in line_counts:
+            cases, session = build_cases(lines)
+            print(f"{'(Session-Cookie)':<26}{lines:>7}{len(session.cookie_header):>13,} Bytes",
+                  file=sys.__stdout__, flush=True)
+            try:
+                for name, func in cases:
+                    if only and only not in name:
+                        continue
+                    result = measure(func, repeat)
+                    results[f"{name}/{lines}"] = result
+                    print(f"{name:<26}{lines:>7}{result['ops_per_sec']:>13,.0f}"
+                          f"{1e6 / result['ops_per_sec']:>12.1f}{result['noise_pct']:>7.1f}"
+                          f"{result['peak_bytes'] / 1024:>11.1f}",
+                          file=sys.__stdout__, flush=True)
+            finally:
+                session.close()
+    return results
+
+
+def remeasure(keys: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Misst einzelne Benchmarks ("name/zeilen") erneut."""
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for lines in sorted({int(key.split("/")[1]) for key in keys}):
+            cases, session = build_cases(lines)
+            try:
+                for name, func in cases:
+                    if f"{name}/{lines}" in keys:
+                        results[f"{name}/{lines}"] = measure(func, repeat)
+            finally:
+                session.close()
+    return results
+
+
+def regressed_keys(regressions: List[str]) -> List[str]:
+    return sorted({line.split(":", 1)[0] for line in regressions})
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float, max_noise: float,
+            max_alloc_regression: float, min_delta_us: float, min_alloc_delta: int) -> List[str]:
+    """
+    Meldungen für alle Benchmarks, die schlechter als der Schwellwert (in %) sind.
+    Das Rauschen beider Bestwerte wird (höchstens `max_noise`) auf den
+    Zeit-Schwellwert aufgeschlagen; größere Ausreißer fangen die Nachmessungen ab.
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        slowdown = 100 * (1 - result["ops_per_sec"] / previous["ops_per_sec"])
+        noise = previous.get("noise_pct", 0.0) + result["noise_pct"]
+        allowed = max_regression + min(noise, max_noise)
+        delta_us = 1e6 / result["ops_per_sec"] - 1e6 / previous["ops_per_sec"]
+        if slowdown > allowed and delta_us >= min_delta_us:
+            regressions.append(f"{key}: {slowdown:.1f}% langsamer (erlaubt {allowed:.1f}%, "
+                               f"{previous['ops_per_sec']:,.0f} -> {result['ops_per_sec']:,.0f} ops/s)")
+        if previous["peak_bytes"] > 0:
+            growth = 100 * (result["peak_bytes"] / previous["peak_bytes"] - 1)
+            if growth > max_alloc_regression and result["peak_bytes"] - previous["peak_bytes"] >= min_alloc_delta:
+                regressions.append(f"{key}: {growth:.1f}% mehr Speicher "
+                                   f"({previous['peak_bytes']} -> {result['peak_bytes']} Bytes)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Microbenchmarks für Preis-, Warenkorb- und Session-Hot-Paths.")
+    parser.add_argument("--lines", default=DEFAULT_LINES, help="Warenkorbgrößen, kommagetrennt")
+    parser.add_argument("--repeat", type=int, default=11, help="Messläufe pro Benchmark (der beste zählt)")
+    parser.add_argument("--only", help="nur Benchmarks, deren Name diesen Text enthält")
+    parser.add_argument("--save-baseline", metavar="PFAD", help="Ergebnisse als Baseline (JSON) speichern")
+    parser.add_argument("--baseline", metavar="PFAD", help="mit dieser Baseline vergleichen")
+    parser.add_argument("--max-regression", type=float, default=25.0,
+                        help="erlaubter Rückgang der ops/s in Prozent (zzgl. gemessenem Rauschen)")
+    parser.add_argument("--max-noise", type=float, default=10.0,
+                        help="höchstens so viele Prozentpunkte Rauschen werden auf --max-regression aufgeschlagen")
+    parser.add_argument("--min-delta-us", type=float, default=0.5,
+                        help="kleinere Verlangsamungen pro Aufruf (in µs) gelten als Rauschen")
+    parser.add_argument("--min-alloc-delta", type=int, default=1024,
+                        help="kleinerer Mehrverbrauch an Spitzenspeicher (in Bytes) gilt als Rauschen")
+    parser.add_argument("--max-alloc-regression", type=float, default=10.0,
+                        help="erlaubter Anstieg des Spitzenspeichers in Prozent")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="auffällige Benchmarks so oft nachmessen, bevor sie als Regression gelten")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    line_counts = [int(value) for value in args.lines.split(",")]
+    results = run_benchmarks(line_counts, args.repeat, args.only)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump({"python": platform.python_version(), "results": results}, baseline_file, indent=2)
+        print(f"Baseline gespeichert: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("python") != platform.python_version():
+            print(f"Hinweis: Baseline mit Python {baseline.get('python')} erstellt, jetzt {platform.python_version()}.")
+        def check():
+            return compare(results, baseline["results"], args.max_regression, args.max_noise,
+                           args.max_alloc_regression, args.min_delta_us, args.min_alloc_delta)
+
+        regressions = check()
+        for attempt in range(args.confirm):
+            if not regressions:
+                break
+            keys = regressed_keys(regressions)
+            print(f"Nachmessung {attempt + 1}/{args.confirm}: {', '.join(keys)}")
+            for key, result in remeasure(keys, args.repeat).items():
+                # Bester Wert über alle Messungen, wie innerhalb eines Laufs
+                if result["ops_per_sec"] > results[key]["ops_per_sec"]:
+                    results[key]["ops_per_sec"] = result["ops_per_sec"]
+                    results[key]["noise_pct"] = result["noise_pct"]
+                results[key]["peak_bytes"] = min(results[key]["peak_bytes"], result["peak_bytes"])
+            regressions = check()
+        if regressions:
+            print("REGRESSIONEN:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"Keine Regression gegenüber {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import time
+import uuid
+from typing import Iterator, Optional, Set
+
+# ----------------------------------------------------------------------
+# Content-addressed Blob-Store für Gravur-Bilder
+# Originale und Kantenmasken aus /upload werden genau einmal auf der
+# lokalen Platte abgelegt: Dateiname = SHA-256 des Inhalts, verteilt auf
+# zwei Verzeichnisebenen (ab/cd/abcd...). Bestellpositionen verweisen nur
+# auf den Hash. Nicht referenzierte Blobs räumt `collect_garbage` ab.
+# ----------------------------------------------------------------------
+
+# Bewusst nicht unter data/ – das Verzeichnis wird öffentlich ausgeliefert
+BLOB_DIR = os.environ.get("SHOP_BLOB_DIR", "blobs")
+# Uploads ohne Bestellung (noch im Warenkorb, Journal) so lange behalten
+GC_GRACE_SECONDS = int(os.environ.get("SHOP_BLOB_GC_GRACE_SECONDS", str(24 * 3600)))
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_valid_digest(digest: Optional[str]) -> bool:
+    return bool(digest) and _DIGEST_PATTERN.match(digest) is not None
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:4], digest)
+
+
+def put_blob(data: bytes) -> str:
+    """Speichert `data` (falls noch nicht vorhanden) und gibt den SHA-256-Hash zurück."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if os.path.exists(path):
+        # Dedupliziert; Zeitstempel erneuern, damit die GC-Schonfrist neu beginnt
+        try:
+            os.utime(path)
+            return digest
+        except FileNotFoundError:
+            # Die GC hat den Blob gerade entfernt – unten neu schreiben
+            pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{digest}.{uuid.uuid4().hex}")
+    with open(tmp_path, "wb") as blob_file:
+        blob_file.write(data)
+        blob_file.flush()
+        os.fsync(blob_file.fileno())
+    # Atomar: Leser sehen entweder nichts oder den vollständigen Blob
+    os.replace(tmp_path, path)
+    return digest
+
+
+def has_blob(digest: Optional[str]) -> bool:
+    return is_valid_digest(digest) and os.path.exists(blob_path(digest))
+
+
+def iter_blob(digest: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Liest einen Blob stückweise (für StreamingResponse)."""
+    with open(blob_path(digest), "rb") as blob_file:
+        while chunk := blob_file.read(chunk_size):
+            yield chunk
+
+
+def guess_media_type(digest: str) -> str:
+    """Bestimmt den Bildtyp anhand der Magic Bytes (der Store speichert keine Metadaten)."""
+    with open(blob_path(digest), "rb") as blob_file:
+        head = blob_file.read(12)
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head.startswith(b"GIF8"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def _delete_unreferenced(referenced: Set[str], dry_run: bool) -> tuple:
+    deleted, kept = 0, 0
+    cutoff = time.time() - GC_GRACE_SECONDS
+    for root, _, files in os.walk(BLOB_DIR):
+        in_tmp = os.path.basename(root) == "tmp"
+        for name in files:
+            path = os.path.join(root, name)
+            if in_tmp:
+                # Abgebrochene Schreibvorgänge
+                referenced_blob = False
+            elif not is_valid_digest(name):
+                continue
+            else:
+                referenced_blob = name in referenced
+            try:
+                if referenced_blob or os.path.getmtime(path) > cutoff:
+                    kept += 1
+                    continue
+                if not dry_run:
+                    if in_tmp:
+                        os.remove(path)
+                    elif not _remove_if_stale(path, cutoff):
+                        kept += 1
+                        continue
+            except FileNotFoundError:
+                # Parallel entfernt (anderer GC-Lauf, abgeschlossener Upload in tmp/)
+                continue
+            deleted += 1
+    return deleted, kept
+
+
+def _remove_if_stale(path: str, cutoff: float) -> bool:
+    """
+    Löscht einen Blob, sofern put_blob ihn nicht inzwischen wieder angefasst hat.
+    Der Blob wird erst beiseite verschoben (atomar), dann wird der Zeitstempel
+    erneut geprüft: ein utime() vor dem Verschieben ist so sichtbar, eines
+    danach schlägt in put_blob fehl und schreibt den Blob neu.
+    """
+    if os.path.getmtime(path) > cutoff:
+        return False
+    tmp_dir = os.path.join(BLOB_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    doomed = os.path.join(tmp_dir, f"{os.path.basename(path)}.gc.{uuid.uuid4().hex}")
+    os.rename(path, doomed)
+    if os.path.getmtime(doomed) > cutoff:
+        # Gerade wieder hochgeladen: zurücklegen (ein parallel neu geschriebener
+        # Blob hat denselben Inhalt)
+        os.replace(doomed, path)
+        return False
+    os.remove(doomed)
+    return True
+
+
+async def collect_garbage(dry_run: bool = False) -> tuple:
+    """Löscht Blobs, auf die keine Bestellposition verweist und die älter als die Schonfrist sind."""
+    # DB erst hier importieren: Schreiben und Lesen von Blobs kommt ohne SQLAlchemy aus
+    from sqlalchemy import select
+    from db import AsyncSessionLocal
+    from db_models import OrderItem
+
+    referenced: Set[str] = set()
+    async with AsyncSessionLocal() as db:
+        for column in (OrderItem.engraving_original_hash, OrderItem.engraving_mask_hash):
+            result = await db.execute(select(column).filter(column.is_not(None)).distinct())
+            referenced.update(result.scalars())
+
+    deleted, kept = await asyncio.to_thread(_delete_unreferenced, referenced, dry_run)
+    action = "würden gelöscht" if dry_run else "gelöscht"
+    print(f"Blob-GC: {deleted} Blobs {action}, {kept} behalten ({len(referenced)} referenziert).")
+    return deleted, kept
+
+
+# Aufruf: python blobstore.py gc [--dry-run]
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "gc":
+        print("Verwendung: python blobstore.py gc [--dry-run]")
+        sys.exit(2)
+    asyncio.run(collect_garbage(dry_run="--dry-run" in sys.argv[2:]))
@@ -0,0 +1,184 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from timing import stage
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# ----------------------------------------------------------------------
+# Antwort-Kompression (gzip / brotli)
+# Komprimiert dynamisches HTML, JSON und Text ab einer Mindestgröße.
+# Bilder und bereits kodierte Antworten werden durchgereicht. Streaming-
+# Antworten werden Chunk für Chunk komprimiert und geflusht, statt sie
+# komplett zu puffern.
+# ----------------------------------------------------------------------
+
+COMPRESSION_ENABLED = os.environ.get("SHOP_COMPRESSION", "1") == "1"
+COMPRESSION_MIN_SIZE = int(os.environ.get("SHOP_COMPRESSION_MIN_SIZE", "500"))
+GZIP_LEVEL = 6
+# Niedrige Brotli-Qualität: für dynamische Inhalte deutlich schneller als 11, kaum größer
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+
+class GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        # wbits=31: gzip-Header und -Trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Komprimiert einen Chunk und flusht, damit der Client ihn sofort lesen kann."""
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Wählt 'br' oder 'gzip' anhand des Accept-Encoding-Headers: das unterstützte
+    Verfahren mit dem höchsten q-Wert, bei Gleichstand br. '*' gilt für alle nicht
+    explizit genannten Verfahren, q=0 schließt aus.
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, *params = (token.strip() for token in part.split(";"))
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in supported:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def make_compressor(encoding: str):
+    return BrotliCompressor() if encoding == "br" else GzipCompressor()
+
+
+class CompressionMiddleware:
+    """Reine ASGI-Middleware (kein BaseHTTPMiddleware), damit Streaming erhalten bleibt."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _should_compress(self, headers: Headers, first_chunk: bytes, more_body: bool) -> bool:
+        # Leerer Body (z.B. HEAD, 304) und bereits kodierte Antworten unverändert lassen
+        if not first_chunk and not more_body:
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return False
+        # Gesamtgröße bekannt: entweder Content-Length oder einziger Body-Chunk
+        if "content-length" in headers:
+            return int(headers["content-length"]) >= self.minimum_size
+        return more_body or len(first_chunk) >= self.minimum_size
+
+    async def send_compressed(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Header zurückhalten, bis der erste Body-Chunk die Entscheidung erlaubt
+            self.start_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(scope=self.start_message)
+            if not self._should_compress(headers, body, more_body):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = make_compressor(self.encoding)
+            with stage("compress"):
+                body = self.compressor.compress(body) if more_body else self.compressor.finish(body)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        with stage("compress"):
+            body = self.compressor.compress(body) if more_body else self.compressor.finish(body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from functions import calculate_order_total, enrich_cart_item_prices
+
+# ----------------------------------------------------------------------
+# Synthetischer Datengenerator und Bulk-Loader für Lasttests
+# Erzeugt Kunden, Bestellungen und Bestellpositionen mit realistischen
+# Verteilungen und lädt sie per Batch-Insert (executemany; aiomysql
+# schreibt das zu mehrzeiligen INSERTs um). Gleicher Seed + gleiche
+# Parameter ergeben exakt dieselben Daten.
+#
+# Aufruf (aus src/):
+#   python datagen.py --customers 100000 --orders 1000000 --seed 42 \
+#       --database-url sqlite+aiosqlite:///scale_test.db
+# ----------------------------------------------------------------------
+
+DEFAULT_END_DATE = date(2025, 12, 31)
+
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hannah", "Jonas", "Lea",
+               "Lukas", "Marie", "Noah", "Paul", "Sophie", "Tim", "Yusuf", "Zoe"]
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker",
+              "Hoffmann", "Koch", "Richter", "Klein", "Wolf", "Neumann", "Yilmaz"]
+STREETS = ["Hauptstraße", "Bahnhofstraße", "Gartenweg", "Schulstraße", "Lindenallee", "Marktplatz"]
+
+# (Wert, Gewicht) – angelehnt an die Auswahl im Shop-Formular
+SIZES = [("klein", 45), ("mittel", 35), ("groß", 20)]
+SHAPES = [("quadrat", 40), ("rund", 25), ("herz", 25), ("stern", 10)]
+FILLINGS = [(None, 35), ("Gesalzenes Karamell", 20), ("Weiße Schokoladen-Ganache", 15),
+            ("Nougat", 12), ("Himbeere", 10), ("Erdnussbutter", 8)]
+TOPPINGS = [(None, 40), ("Gehackte Pistazien", 20), ("Goldstaub", 10), ("Frische Himbeeren", 15),
+            ("Schokoladensplitter", 15)]
+# Mengen pro Position; 5 und 10 sind die Schwellen der Mengenrabatte
+QUANTITIES = [(1, 30), (2, 22), (3, 14), (4, 8), (5, 10), (6, 4), (8, 3), (10, 6), (12, 2), (20, 1)]
+# Montag=0 ... Sonntag=6; Mittwoch durch den Mittwochs-Rabatt überhöht
+WEEKDAY_WEIGHTS = [0.8, 0.9, 1.7, 1.0, 1.2, 1.4, 1.0]
+# Bestellungen über den Tag (8–22 Uhr), Spitzen mittags und abends
+HOUR_WEIGHTS = [1, 2, 3, 4, 6, 5, 4, 4, 5, 7, 8, 6, 4, 2]
+
+SECOND_CHANCE_SHARE = 0.18   # Anteil der Warenkörbe mit Second-Chance-Position
+CART_SIZE_CONTINUE = 0.45    # Wahrscheinlichkeit für eine weitere Position (geometrisch)
+MAX_CART_LINES = 8
+REPEAT_CUSTOMER_SKEW = 2.0   # >1: wenige Kunden bestellen sehr häufig
+
+
+def _split(pairs):
+    values, weights = zip(*pairs)
+    cumulative, total = [], 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return list(values), cumulative
+
+
+class DataGenerator:
+    """Deterministischer Generator für Kunden, Bestellungen und Positionen."""
+
+    def __init__(self, seed: int, customers: int, end_date: date, days: int):
+        self.rng = random.Random(seed)
+        self.customers = customers
+        self.sizes = _split(SIZES)
+        self.shapes = _split(SHAPES)
+        self.fillings = _split(FILLINGS)
+        self.toppings = _split(TOPPINGS)
+        self.quantities = _split(QUANTITIES)
+        self.hours = _split([(8 + i, w) for i, w in enumerate(HOUR_WEIGHTS)])
+        self.days = _split([
+            (end_date - timedelta(days=offset), WEEKDAY_WEIGHTS[(end_date - timedelta(days=offset)).weekday()])
+            for offset in range(days)
+        ])
+        self._price_cache: Dict[tuple, float] = {}
+
+    def _pick(self, values_and_weights):
+        values, cumulative = values_and_weights
+        return self.rng.choices(values, cum_weights=cumulative)[0]
+
+    def _item_price(self, product_id: int, quantity: int) -> float:
+        key = (product_id, quantity)
+        if key not in self._price_cache:
+            item = enrich_cart_item_prices({"product_id": product_id, "quantity": quantity})
+            self._price_cache[key] = item["total_item_price"]
+        return self._price_cache[key]
+
+    def customer_rows(self, start_id: int, count: int) -> List[Dict]:
+        rows = []
+        for c_id in range(start_id, start_id + count):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            rows.append({
+                "Kunden_ID": c_id,
+                "name": f"{first} {last}",
+                "email": f"kunde{c_id}@example.com",
+                "address": f"{self.rng.choice(STREETS)} {self.rng.randint(1, 120)}, {self.rng.randint(10000, 99999)}",
+            })
+        return rows
+
+    def order_rows(self, start_order_id: int, start_item_id: int, count: int, first_customer_id: int):
+        """Erzeugt `count` Bestellungen samt Positionen (jeweils als Zeilen-Dicts)."""
+        orders, items = [], []
+        item_id = start_item_id
+        for order_id in range(start_order_id, start_order_id + count):
+            lines = []
+            if self.rng.random() < SECOND_CHANCE_SHARE:
+                lines.append({
+                    "product_id": 2, "quantity": self._pick(self.quantities),
+                    "size": "Restposten", "shape": "Zufällig", "filling": "N/A", "toppings": "N/A",
+                })
+            custom_lines = 1
+            while custom_lines < MAX_CART_LINES and self.rng.random() < CART_SIZE_CONTINUE:
+                custom_lines += 1
+            for _ in range(custom_lines):
+                lines.append({
+                    "product_id": 1, "quantity": self._pick(self.quantities),
+                    "size": self._pick(self.sizes), "shape": self._pick(self.shapes),
+                    "filling": self._pick(self.fillings), "toppings": self._pick(self.toppings),
+                })
+
+            for line in lines:
+                line["total_item_price"] = self._item_price(line["product_id"], line["quantity"])
+                items.append({
+                    "id": item_id, "order_id": order_id, "product_id": line["product_id"],
+                    "quantity": line["quantity"], "size": line["size"], "shape": line["shape"],
+                    "filling": line["filling"], "toppings": line["toppings"],
+                })
+                item_id += 1
+
+            day = self._pick(self.days)
+            order_date = datetime(day.year, day.month, day.day, self._pick(self.hours), self.rng.randint(0, 59))
+            customer_offset = int(self.customers * self.rng.random() ** REPEAT_CUSTOMER_SKEW)
+            orders.append({
+                "Bestell_ID": order_id,
+                "Kunden_ID": first_customer_id + customer_offset,
+                "Gesamtsumme": calculate_order_total(lines),
+                "Bestelldatum": order_date,
+                "Status": "Delivered",
+            })
+        return orders, items
+
+
+async def load(args):
+    # Erst hier importieren, da db.py die Engine beim Import aus SHOP_DATABASE_URL erzeugt
+    from sqlalchemy import func, select
+    from db import Base, engine, seed_initial_data
+    from db_models import Customer, Order, OrderItem
+    from rollups import rebuild_rollups
+
+    async def _max_id(conn, column) -> int:
+        return (await conn.execute(select(func.max(column)))).scalar() or 0
+
+    async with engine.begin() as conn:
+        # Nur fehlende Tabellen anlegen – bestehende Daten bleiben erhalten
+        await conn.run_sync(Base.metadata.create_all)
+    await seed_initial_data()
+
+    async with engine.begin() as conn:
+        first_customer_id = await _max_id(conn, Customer.c_id) + 1
+        next_order_id = await _max_id(conn, Order.id) + 1
+        next_item_id = await _max_id(conn, OrderItem.id) + 1
+
+    generator = DataGenerator(args.seed, args.customers, args.end_date, args.days)
+    started = time.perf_counter()
+    total_rows = 0
+
+    async def insert_batches(table, make_rows, total):
+        nonlocal total_rows
+        done = 0
+        while done < total:
+            count = min(args.batch_size, total - done)
+            async with engine.begin() as conn:
+                if engine.dialect.name == "sqlite":
+                    await conn.exec_driver_sql("PRAGMA synchronous=OFF")
+                for target, rows in make_rows(done, count):
+                    await conn.execute(target.insert(), rows)
+                    total_rows += len(rows)
+            done += count
+            elapsed = time.perf_counter() - started
+            print(f"  {table}: {done}/{total} ({total_rows / elapsed:,.0f} Zeilen/s)")
+
+    await insert_batches(
+        "customers",
+        lambda done, count: [(Customer.__table__, generator.customer_rows(first_customer_id + done, count))],
+        args.customers,
+    )
+
+    item_counter = [next_item_id]
+
+    def order_batch(done, count):
+        orders, items = generator.order_rows(next_order_id + done, item_counter[0], count, first_customer_id)
+        item_counter[0] += len(items)
+        return [(Order.__table__, orders), (OrderItem.__table__, items)]
+
+    await insert_batches("orders", order_batch, args.orders)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {total_rows:,} Zeilen in {elapsed:.1f}s geladen ({total_rows / elapsed:,.0f} Zeilen/s).")
+
+    if not args.skip_rollups:
+        await rebuild_rollups()
+    await engine.dispose()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Synthetische Testdaten für den Brownie-Shop erzeugen und laden.")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="Zeitraum der Bestelldaten in Tagen")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=DEFAULT_END_DATE)
+    parser.add_argument("--batch-size", type=int, default=5_000, help="Zeilen pro Insert-Batch")
+    parser.add_argument("--database-url", help="überschreibt SHOP_DATABASE_URL")
+    parser.add_argument("--skip-rollups", action="store_true", help="Reporting-Rollups nicht neu aufbauen")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url:
+        os.environ["SHOP_DATABASE_URL"] = args.database_url
+    asyncio.run(load(args))
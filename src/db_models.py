@@ -1,7 +1,7 @@
-from sqlalchemy import String, Float, ForeignKey, DateTime, Float # Füge Float hinzu, aber nutze Decimal für Währung
+from sqlalchemy import String, Float, ForeignKey, DateTime, Date, Integer, UniqueConstraint # Füge Float hinzu, aber nutze Decimal für Währung
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 import db
 
 class Customer(db.Base):
@@ -28,8 +28,10 @@ class Order(db.Base):
     id: Mapped[int] = mapped_column("Bestell_ID", primary_key=True, index=True)
     customer_id: Mapped[int] = mapped_column("Kunden_ID", ForeignKey("customers.Kunden_ID"))
     total_amount: Mapped[Float] = mapped_column("Gesamtsumme", Float(10, 2))
-    order_date: Mapped[datetime] = mapped_column("Bestelldatum", DateTime(), default=datetime.now())
+    order_date: Mapped[datetime] = mapped_column("Bestelldatum", DateTime(), default=datetime.now)
     status: Mapped[str] = mapped_column("Status", String(50))
+    # Vom Checkout-Formular mitgesendet; verhindert doppelte Bestellungen bei erneutem Absenden
+    idempotency_key: Mapped[Optional[str]] = mapped_column("Idempotenz_Schluessel", String(64), unique=True)
     customer: Mapped["Customer"] = relationship(back_populates="orders")
     items: Mapped[List["OrderItem"]] = relationship(back_populates="order")
 
@@ -47,5 +49,41 @@ class OrderItem(db.Base):
     size: Mapped[Optional[str]] = mapped_column(String(50))
     shape: Mapped[Optional[str]] = mapped_column(String(50))
 
+    # SHA-256-Verweise in den Blob-Store (blobstore.py): Originalbild und Kantenmaske
+    engraving_original_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    engraving_mask_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+
+    # Positionspreis zum Bestellzeitpunkt – Rollup-Neuaufbau bleibt so von späteren
+    # Preisänderungen unberührt. NULL bei Positionen von vor Einführung der Spalte.
+    line_total: Mapped[Optional[Float]] = mapped_column(Float(10, 2))
+
     order: Mapped["Order"] = relationship(back_populates="items")
-    product: Mapped["Product"] = relationship(back_populates="order_items")
\ No newline at end of file
+    product: Mapped["Product"] = relationship(back_populates="order_items")
+
+
+# ----------------------------------------------------------------------
+# Reporting-Rollups (werden beim Checkout inkrementell fortgeschrieben)
+# ----------------------------------------------------------------------
+
+class DailyProductSales(db.Base):
+    """Tagesmengen pro Produkt und Konfiguration (Größe, Form, Füllung)."""
+    __tablename__ = "rollup_daily_product_sales"
+    __table_args__ = (
+        UniqueConstraint("day", "product_id", "size", "shape", "filling", name="uq_rollup_daily_product_sales"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    day: Mapped[date] = mapped_column(Date(), index=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
+    # Leerer String statt NULL, damit der Unique-Key auch ohne Füllung greift
+    size: Mapped[str] = mapped_column(String(50), default="")
+    shape: Mapped[str] = mapped_column(String(50), default="")
+    filling: Mapped[str] = mapped_column(String(50), default="")
+    quantity: Mapped[int] = mapped_column(Integer(), default=0)
+    revenue: Mapped[Float] = mapped_column(Float(10, 2), default=0.0)
+
+class DailyRevenue(db.Base):
+    """Tagesumsatz über alle Bestellungen (inkl. Versand und MwSt)."""
+    __tablename__ = "rollup_daily_revenue"
+    day: Mapped[date] = mapped_column(Date(), primary_key=True)
+    order_count: Mapped[int] = mapped_column(Integer(), default=0)
+    revenue: Mapped[Float] = mapped_column(Float(10, 2), default=0.0)
@@ -2,6 +2,7 @@ import numpy as np
 from scipy.ndimage import convolve
 from PIL import Image, ImageOps
 import io
+from timing import stage
 
 # Konvertiert RGB (von PIL) zu Graustufen 
 def manual_cvtColor_RGB2GRAY(image_np):
@@ -19,28 +20,43 @@ def prewitt_edge_detection(image_bytes: bytes):
     Gibt die Kanten als PIL Image (Graustufen) zurück.
     """
     # 1. Bild von Bytes laden
-    image_rgb = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = ImageOps.exif_transpose(image_rgb)
-    image_np = np.array(img)
+    with stage("decode"):
+        image_rgb = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        img = ImageOps.exif_transpose(image_rgb)
+        image_np = np.array(img)
 
     # 2. Graustufenkonvertierung
-    gray_image = manual_cvtColor_RGB2GRAY(image_np)
+    with stage("grayscale"):
+        gray_image = manual_cvtColor_RGB2GRAY(image_np)
     
     # 3. Prewitt-Kernel
     kernel_x = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=np.float32)
     kernel_y = np.array([[-1, -1, -1], [0, 0, 0], [1, 1, 1]], dtype=np.float32)
     
     # 4. Faltung mit SciPy
-    horizontal_edges = convolve(gray_image, kernel_x)
-    vertical_edges = convolve(gray_image, kernel_y)
+    with stage("convolve"):
+        horizontal_edges = convolve(gray_image, kernel_x)
+        vertical_edges = convolve(gray_image, kernel_y)
     
-    # 5. Gradientenbetrag
-    gradient_magnitude = np.sqrt(horizontal_edges**2 + vertical_edges**2)
-    
-    # 6. Schwellwertbildung und Normalisierung
-    threshold = 50
-    edges_np = np.where(gradient_magnitude > threshold, 255, 0)
-    
-    # 7. Als PIL Image (Graustufen) zurückgeben
-    edges_image = Image.fromarray(edges_np.astype(np.uint8), mode='L')
-    return edges_image
\ No newline at end of file
+    with stage("threshold"):
+        # 5. Gradientenbetrag
+        gradient_magnitude = np.sqrt(horizontal_edges**2 + vertical_edges**2)
+        
+        # 6. Schwellwertbildung und Normalisierung
+        threshold = 50
+        edges_np = np.where(gradient_magnitude > threshold, 255, 0)
+        
+        # 7. Als PIL Image (Graustufen) zurückgeben
+        edges_image = Image.fromarray(edges_np.astype(np.uint8), mode='L')
+    return edges_image
+
+def render_edges_png(image_bytes: bytes) -> bytes:
+    """
+    Komplette Pipeline für /upload: Kantenerkennung und PNG-Kodierung.
+    Gibt nur Bytes zurück, damit der Aufruf auch in einem Prozess-Pool läuft.
+    """
+    edges_image = prewitt_edge_detection(image_bytes)
+    with stage("png_encode"):
+        img_byte_arr = io.BytesIO()
+        edges_image.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
@@ -1,5 +1,7 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from datetime import datetime # Importieren Sie dies oben in functions.py
+from models import SHIPPING_COST, TAX_RATE
+from timing import timed
 
 SECOND_CHANCE_DISCOUNT_RATE = 0.25
 QUANTITY_DISCOUNT_5_RATE = 0.05
@@ -10,6 +12,7 @@ WEDNESDAY_DISCOUNT_RATE = 0.05
 WEDNESDAY_WEEKDAY = 2 # Montag=0, Dienstag=1, Mittwoch=2, ...
 BASE_PRODUCT_PRICE = 5.90
 
+@timed("pricing")
 def calculate_totals(cart_items: List[Dict]) -> Dict:
     # ----------------------------------------------------
     # 1. PRÜFUNG DES MITTWOCHS-RABATTS
@@ -99,6 +102,15 @@ def calculate_totals(cart_items: List[Dict]) -> Dict:
 def format_currency(amount: float) -> str:
     return f"{amount:.2f}".replace('.', ',')
 
+@timed("pricing")
+def calculate_order_total(cart_items: List[Dict]) -> float:
+    """Gesamtbetrag der Bestellung aus den angereicherten Session-Preisen inkl. Versand und Steuern."""
+    # item['total_item_price'] enthält bereits den korrekten Gesamtpreis
+    subtotal = sum(item['total_item_price'] for item in cart_items)
+    tax = subtotal * TAX_RATE
+    return round(subtotal + SHIPPING_COST + tax, 2)
+
+@timed("pricing")
 def enrich_cart_item_prices(item: Dict) -> Dict:
     """Fügt einem Session-Warenkorbartikel alle benötigten Preis-Felder hinzu."""
     base_price = BASE_PRODUCT_PRICE
@@ -138,3 +150,74 @@ def enrich_cart_item_prices(item: Dict) -> Dict:
 
     return item
 
+@timed("cart_html")
+def render_cart_items_html(cart_items: List[Dict]) -> Tuple[str, int]:
+    """HTML der Warenkorb-Positionen (für cart.html) und Gesamtzahl der Brownies; erwartet angereicherte Items."""
+    items_html = ""
+    total_items_count = 0
+
+    for item in cart_items:
+        # Hier die korrigierten Variablen abrufen
+        item_id = item.get("session_item_id")
+        quantity = item.get('quantity', 0)
+        total_items_count += quantity
+
+        personalized_price = f"{item['total_item_price']:.2f}"
+        discount_amount = item.get("total_discount", 0.0) 
+        unit_price_discounted = item.get("personalized_unit_price_after_discount", item['base_price'])
+        
+        # Beschreibung und Rabatt-Badge
+        is_sc = item['product_id'] == 2
+        is_qty_discount = item['product_id'] == 1 and discount_amount > 0.01
+
+        if is_sc:
+            description = "Restposten, Form & Füllung zufällig"
+            discount_badge = "<p class='discount-info'>🎉 **25% Rabatt** angewendet!</p>"
+            unit_price_info = f"<p class='unit-price-info'>Stück: <span class='original-price'>({item['base_price']:.2f} €)</span> {unit_price_discounted:.2f} €</p>"
+            title_class = "second-chance-title"
+            title_text = "Second-Chance Brownies"
+        else:
+            description = (
+                f"Größe: <strong>{item['size'].capitalize()}</strong>, "
+                f"Form: <strong>{item['shape'].capitalize()}</strong>, "
+                f"Füllung: <em>{item['filling'] or 'Keine'}</em>, "
+                f"Toppings: <em>{item['toppings'] or 'Keine'}</em>"
+            )
+            discount_badge = ""
+            if is_qty_discount:
+                 discount_text = "Mengenrabatt (5%)" if unit_price_discounted > item['base_price'] * 0.91 else "Mengenrabatt (10%)"
+                 discount_badge = f"<p class='discount-info'>🎉 {discount_text} angewendet!</p>"
+                 original_unit_price_str = f"({item['base_price']:.2f} €)"
+                 unit_price_info = f"<p class='unit-price-info'>Stück: <span class='original-price'>{original_unit_price_str}</span> {unit_price_discounted:.2f} €</p>"
+            else:
+                 unit_price_info = f"<p class='unit-price-info'>Stück: {item['base_price']:.2f} €</p>"
+            title_class = ""
+            title_text = item['product_name']
+
+
+        items_html += f"""
+        <div class='cart-item' id='item-{item_id}'>
+            <div class='item-details'>
+                <h4 class='{title_class}'>{title_text}</h4>
+                <p class='description'>{description}</p>
+                {unit_price_info}
+                {discount_badge}
+            </div>
+            
+            <form action='/cart/update/{item_id}' method='post' class='quantity-form'>
+                <input type='hidden' name='product_id' value='{item['product_id']}'>
+                <input type='number' name='new_quantity' value='{quantity}' min='0' class='qty-input'>
+                <button type='submit' class='btn-update' title='Menge aktualisieren'>✓</button>
+            </form>
+            
+            <div class='item-price'>
+                <strong>{personalized_price} €</strong>
+            </div>
+            
+            <form action='/cart/remove/{item_id}' method='post' class='remove-form'>
+                <button type='submit' class='btn-remove' title='Artikel löschen'>&times;</button>
+            </form>
+        </div>
+        """
+
+    return items_html, total_items_count
@@ -0,0 +1,61 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db_models import Order
+
+# ----------------------------------------------------------------------
+# Idempotenter Checkout
+# GET /checkout vergibt einen Schlüssel, der mit dem Formular zurückkommt
+# und an der Bestellung gespeichert wird (Unique-Constraint). Wiederholte
+# Absendungen (Doppelklick, Retry des Browsers) landen so bei der
+# ursprünglichen Bestellung. Ein LRU-Cache pro Prozess beantwortet die
+# häufigen, zeitnahen Wiederholungen ohne Datenbankzugriff.
+# ----------------------------------------------------------------------
+
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("SHOP_IDEMPOTENCY_CACHE_SIZE", "10000"))
+MAX_KEY_LENGTH = 64
+
+
+class IdempotencyCache:
+    """LRU-Abbildung Idempotenz-Schlüssel -> Bestell-ID."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[int]:
+        order_id = self._entries.get(key)
+        if order_id is not None:
+            self._entries.move_to_end(key)
+        return order_id
+
+    def put(self, key: str, order_id: int):
+        self._entries[key] = order_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+
+checkout_keys = IdempotencyCache(IDEMPOTENCY_CACHE_SIZE)
+
+
+def is_valid_key(key: Optional[str]) -> bool:
+    return bool(key) and len(key) <= MAX_KEY_LENGTH
+
+
+async def find_order_id(db: AsyncSession, key: str) -> Optional[int]:
+    """Bestell-ID zu einem Schlüssel: erst aus dem Cache, dann aus der Datenbank."""
+    order_id = checkout_keys.get(key)
+    if order_id is not None:
+        return order_id
+    order_id = (await db.execute(select(Order.id).filter(Order.idempotency_key == key))).scalar()
+    if order_id is not None:
+        checkout_keys.put(key, order_id)
+    return order_id
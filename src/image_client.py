@@ -0,0 +1,74 @@
+import os
+import time
+from typing import Optional
+
+import httpx
+
+import image_pool
+from timing import stage
+
+# ----------------------------------------------------------------------
+# Anbindung des Shops an den Bildverarbeitungs-Dienst (image_service.py)
+# Mit SHOP_IMAGE_SERVICE_URL schickt /upload die Bilder per HTTP an den
+# Dienst; ein AsyncClient pro Worker hält die Verbindungen offen (Pooling).
+# Ist der Dienst nicht erreichbar, wird lokal gerechnet und der Dienst
+# für eine Weile übersprungen, statt jeden Upload in den Timeout laufen
+# zu lassen.
+# ----------------------------------------------------------------------
+
+IMAGE_SERVICE_URL = os.environ.get("SHOP_IMAGE_SERVICE_URL")
+IMAGE_SERVICE_TIMEOUT = float(os.environ.get("SHOP_IMAGE_SERVICE_TIMEOUT", "10"))
+IMAGE_SERVICE_MAX_CONNECTIONS = int(os.environ.get("SHOP_IMAGE_SERVICE_MAX_CONNECTIONS", "20"))
+RETRY_AFTER_SECONDS = 30.0
+# Nur diese Antworten (und Verbindungsfehler) gelten als "Dienst nicht verfügbar"
+UNAVAILABLE_STATUS_CODES = {502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+_skip_remote_until = 0.0
+
+
+def start_image_client():
+    """Erzeugt den gepoolten HTTP-Client, falls ein Dienst konfiguriert ist."""
+    global _client
+    if not IMAGE_SERVICE_URL or _client is not None:
+        return
+    _client = httpx.AsyncClient(
+        base_url=IMAGE_SERVICE_URL,
+        timeout=IMAGE_SERVICE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=IMAGE_SERVICE_MAX_CONNECTIONS,
+            max_keepalive_connections=IMAGE_SERVICE_MAX_CONNECTIONS,
+        ),
+    )
+    print(f"Bildverarbeitung über {IMAGE_SERVICE_URL}.")
+
+
+async def close_image_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def render_edges(image_bytes: bytes) -> bytes:
+    """Kantenbild als PNG-Bytes – vom Dienst oder, als Rückfall, lokal."""
+    global _skip_remote_until
+    if _client is not None and time.monotonic() >= _skip_remote_until:
+        try:
+            with stage("image_service"):
+                response = await _client.post(
+                    "/upload", files={"file": ("upload", image_bytes, "application/octet-stream")}
+                )
+            if response.status_code == 200:
+                return response.content
+            if response.status_code == 400:
+                # Der Dienst hat das Bild bereits abgelehnt – lokal käme derselbe Fehler
+                raise ValueError("Datei ist kein lesbares Bild.")
+            if response.status_code in UNAVAILABLE_STATUS_CODES:
+                print(f"Bildverarbeitungs-Dienst antwortet mit {response.status_code}, rechne lokal.")
+                _skip_remote_until = time.monotonic() + RETRY_AFTER_SECONDS
+            # Andere Fehler liegen nicht am Dienst selbst: lokal rechnen, Dienst bleibt in Gebrauch
+        except httpx.TransportError as e:
+            print(f"Bildverarbeitungs-Dienst nicht erreichbar ({e!r}), rechne lokal.")
+            _skip_remote_until = time.monotonic() + RETRY_AFTER_SECONDS
+    return await image_pool.render_edges(image_bytes)
@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from edges import render_edges_png
+from timing import record, run_timed, stage
+
+# ----------------------------------------------------------------------
+# Prozess-Pool für die Bildverarbeitung
+# Die Kantenerkennung ist CPU-lastig und blockiert sonst den Event-Loop.
+# Jeder Uvicorn-Worker startet beim Hochfahren einen eigenen Pool; die
+# Standardgröße teilt die CPU-Kerne auf die Worker auf (SHOP_WORKERS wird
+# von serve.py gesetzt), sodass insgesamt nicht mehr Prozesse als Kerne
+# rechnen. SHOP_IMAGE_POOL_SIZE=0 verarbeitet in einem Thread des Workers.
+# Stürzt ein Pool-Prozess ab, ist der ganze Pool unbrauchbar: er wird dann
+# ersetzt, der betroffene Auftrag endet mit BrokenProcessPool.
+# ----------------------------------------------------------------------
+
+def _default_pool_size() -> int:
+    workers = int(os.environ.get("SHOP_WORKERS", "1"))
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+IMAGE_POOL_SIZE = int(os.environ.get("SHOP_IMAGE_POOL_SIZE", _default_pool_size()))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_up() -> int:
+    # Kurz schlafen, damit jeder Aufruf in einem anderen Prozess landet
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def _render_in_worker(image_bytes: bytes):
+    # Läuft im Pool-Prozess: dort gibt es keinen Request-Timer, die Stages gehen als Ergebnis zurück
+    return run_timed(render_edges_png, image_bytes)
+
+
+def start_image_pool():
+    """Startet den Pool und forkt alle Prozesse vorab (inkl. NumPy/SciPy-Import)."""
+    global _pool
+    if IMAGE_POOL_SIZE <= 0 or _pool is not None:
+        return
+    # spawn statt fork: der Worker hat bereits Threads (Event-Loop, DB-Treiber)
+    _pool = ProcessPoolExecutor(max_workers=IMAGE_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+    wait([_pool.submit(_warm_up) for _ in range(IMAGE_POOL_SIZE)])
+    print(f"Bildverarbeitungs-Pool mit {IMAGE_POOL_SIZE} Prozessen bereit.")
+
+
+def shutdown_image_pool():
+    """Wartet auf laufende Aufträge und beendet die Pool-Prozesse."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def pool_ready() -> bool:
+    """False, solange ein defekter Pool ersetzt wird (für Readiness-Checks)."""
+    return IMAGE_POOL_SIZE <= 0 or _pool is not None
+
+
+async def _replace_broken_pool(broken: ProcessPoolExecutor):
+    global _pool
+    # Prüfen und Zurücksetzen im Event-Loop: parallele Fehlschläge starten nur einen neuen Pool
+    if _pool is not broken:
+        return
+    _pool = None
+    print("Bildverarbeitungs-Pool defekt (Prozess abgestürzt), starte neu...")
+    broken.shutdown(wait=False, cancel_futures=True)
+    await asyncio.to_thread(start_image_pool)
+
+
+async def render_edges(image_bytes: bytes) -> bytes:
+    """Kantenbild als PNG-Bytes – im Pool oder, ohne Pool, in einem Thread."""
+    pool = _pool
+    if pool is None:
+        # to_thread übernimmt den Kontext, die Stages aus edges.py bleiben sichtbar
+        return await asyncio.to_thread(render_edges_png, image_bytes)
+    with stage("edges_pool"):
+        try:
+            png_bytes, stages = await asyncio.get_running_loop().run_in_executor(pool, _render_in_worker, image_bytes)
+        except BrokenProcessPool:
+            await _replace_broken_pool(pool)
+            raise
+    # decode/grayscale/convolve/threshold/png_encode aus dem Pool-Prozess im Request verbuchen
+    for name, seconds in stages.items():
+        record(name, seconds)
+    return png_bytes
@@ -0,0 +1,127 @@
+import argparse
+import os
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+
+from image_pool import pool_ready, render_edges, shutdown_image_pool, start_image_pool
+
+# ----------------------------------------------------------------------
+# Eigenständiger Bildverarbeitungs-Dienst
+# Nur Kantenerkennung (gleiche Pipeline wie der Shop: edges.py über
+# image_pool.py), ohne Datenbank, Sessions und Templates – startet schnell
+# und lässt sich getrennt vom Shop skalieren. Der Shop nutzt ihn, wenn
+# SHOP_IMAGE_SERVICE_URL gesetzt ist (siehe image_client.py).
+#
+# Aufruf (aus src/):  python image_service.py --port 8001 --workers 2
+# ----------------------------------------------------------------------
+
+_ready = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _ready
+    start_image_pool()
+    _ready = True
+    yield
+    # Ab jetzt keine neuen Aufträge mehr vom Load Balancer
+    _ready = False
+    shutdown_image_pool()
+
+
+app = FastAPI(title="Brownie-Bildverarbeitung", lifespan=lifespan)
+
+# Einfaches Test-Frontend
+HTML_CONTENT = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Lokale Kantenerkennung</title>
+</head>
+<body>
+    <h1>Bild-Upload zur Kantenerkennung (Prewitt)</h1>
+    
+    <form action="/upload" method="post" enctype="multipart/form-data">
+        <input type="file" name="file" accept="image/*">
+        <input type="submit" value="Kanten erkennen">
+    </form>
+    
+    <img id="result-image" style="margin-top: 20px; max-width: 100%;">
+    
+    <script>
+        // JavaScript, um das Formular asynchron zu senden und das Bild anzuzeigen
+        document.querySelector('form').addEventListener('submit', async function(e) {
+            e.preventDefault();
+            
+            const formData = new FormData(e.target);
+            const response = await fetch('/upload', {
+                method: 'POST',
+                body: formData
+            });
+            
+            if (response.ok) {
+                // Konvertiert die empfangenen Bild-Bytes in eine URL und zeigt sie an
+                const blob = await response.blob();
+                const imageUrl = URL.createObjectURL(blob);
+                document.getElementById('result-image').src = imageUrl;
+            } else {
+                alert('Fehler bei der Bildverarbeitung.');
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+@app.get("/", response_class=HTMLResponse)
+async def main():
+    return HTML_CONTENT
+
+
+@app.post("/upload")
+async def process_image(file: UploadFile = File(...)):
+    """Kantenbild als PNG."""
+    image_bytes = await file.read()
+    try:
+        png_bytes = await render_edges(image_bytes)
+    except (OSError, ValueError):
+        # Nicht lesbare oder abgeschnittene Bilder (PIL: UnidentifiedImageError/OSError beim Dekodieren)
+        raise HTTPException(status_code=400, detail="Datei ist kein lesbares Bild.")
+    except BrokenProcessPool:
+        # Pool wird gerade ersetzt; 503 lässt den Shop vorübergehend lokal rechnen
+        raise HTTPException(status_code=503, detail="Bildverarbeitung wird neu gestartet.")
+    return Response(content=png_bytes, media_type="image/png")
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: der Prozess antwortet."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: Bild-Pool gestartet (bzw. nach Absturz ersetzt) und kein Herunterfahren im Gange."""
+    if not _ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    if not pool_ready():
+        return JSONResponse(status_code=503, content={"status": "restarting"})
+    return {"status": "ready"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Bildverarbeitungs-Dienst starten.")
+    parser.add_argument("--host", default=os.environ.get("SHOP_IMAGE_SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SHOP_IMAGE_SERVICE_PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # Von image_pool.py ausgewertet: CPU-Kerne auf die Worker aufteilen
+    os.environ["SHOP_WORKERS"] = str(args.workers)
+    uvicorn.run("image_service:app", host=args.host, port=args.port, workers=args.workers)
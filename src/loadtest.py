@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import io
+import math
+import os
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+# ----------------------------------------------------------------------
+# Lasttest für den Kauf-Funnel
+# Virtuelle Käufer (jeweils eigener Cookie-Jar) durchlaufen
+# /welcome → /shop → /upload → /order → /cart → /cart/update → /checkout,
+# wahlweise in-process über ASGI oder gegen einen laufenden Server.
+# Ausgabe: Durchsatz, p50/p95/p99 pro Route, Fehlerquoten, DB-Zeilen.
+#
+# Aufruf (aus src/):
+#   python loadtest.py --users 50 --ramp 10 --duration 60 \
+#       --mix purchase=0.3,cart=0.3,browse=0.4
+#   python loadtest.py --base-url http://localhost:8000 \
+#       --database-url sqlite+aiosqlite:///shop.db
+# ----------------------------------------------------------------------
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///loadtest.db"
+ITEM_ID_PATTERN = re.compile(r"id='item-([0-9a-f-]+)'")
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'name="idempotency_key" value="([0-9a-f]+)"')
+
+
+class Stats:
+    """Latenzen und Fehler pro Route."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.funnels: Dict[str, int] = {}
+
+    def add(self, route: str, seconds: float, ok: bool):
+        self.latencies.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-Rank-Perzentil einer aufsteigend sortierten Liste."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p * len(sorted_values) / 100) - 1))
+    return sorted_values[index]
+
+
+def make_test_image(size: int = 256) -> bytes:
+    """Kleines, deterministisches Testbild (Kreis auf Verlauf) als PNG."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (size, size))
+    draw = ImageDraw.Draw(image)
+    for y in range(size):
+        draw.line([(0, y), (size, y)], fill=(y % 256, 80, 160))
+    draw.ellipse([size // 4, size // 4, 3 * size // 4, 3 * size // 4], fill=(250, 240, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class VirtualShopper:
+    """Ein Käufer mit eigenem Cookie-Jar, der ein Szenario durchläuft."""
+
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, rng: random.Random, image: bytes,
+                 double_submit: float = 0.0):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.image = image
+        self.double_submit = double_submit
+
+    async def _request(self, method: str, url: str, route: Optional[str] = None, **kwargs) -> Optional[httpx.Response]:
+        route = f"{method} {route or url}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.add(route, time.perf_counter() - started, ok=False)
+            return None
+        self.stats.add(route, time.perf_counter() - started, ok=response.status_code < 400)
+        return response
+
+    async def browse(self):
+        await self._request("GET", "/welcome")
+        await self._request("GET", "/shop")
+
+    async def cart(self) -> bool:
+        await self.browse()
+        await self._request("POST", "/upload", files={"file": ("motiv.png", self.image, "image/png")})
+        await self._request("POST", "/order", data={
+            "size": self.rng.choice(["klein", "mittel", "groß"]),
+            "shape": self.rng.choice(["quadrat", "rund", "herz"]),
+            "filling": self.rng.choice(["", "Nougat", "Gesalzenes Karamell"]),
+            "toppings": "",
+            "quantity": str(self.rng.choice([1, 2, 3, 5, 10])),
+            "old_brownies_qty": str(self.rng.choice([0, 0, 0, 2])),
+        })
+        response = await self._request("GET", "/cart")
+        item_ids = ITEM_ID_PATTERN.findall(response.text) if response is not None else []
+        if not item_ids:
+            return False
+        await self._request(
+            "POST", f"/cart/update/{item_ids[0]}", route="/cart/update/{id}",
+            data={"new_quantity": str(self.rng.randint(1, 12))},
+        )
+        return True
+
+    async def purchase(self):
+        if not await self.cart():
+            return
+        response = await self._request("GET", "/checkout")
+        keys = IDEMPOTENCY_KEY_PATTERN.findall(response.text) if response is not None else []
+        data = {
+            "name": "Last Test",
+            "email": f"last{self.rng.randint(1, 10_000)}@example.com",
+            "address": "Teststraße 1",
+            "zip": "12345 Teststadt",
+            "payment_method": "card",
+            "delivery_date": "2030-01-07",
+            "idempotency_key": keys[0] if keys else "",
+        }
+        submits = 2 if self.rng.random() < self.double_submit else 1
+        # Doppelklick: beide Absendungen gleichzeitig mit demselben Schlüssel
+        await asyncio.gather(*(self._request("POST", "/checkout", data=data) for _ in range(submits)))
+        self.stats.funnels["double_submit"] = self.stats.funnels.get("double_submit", 0) + submits - 1
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("browse", "cart", "purchase"):
+            raise SystemExit(f"Unbekanntes Szenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def start_delay(index: int, args) -> float:
+    """Startzeitpunkt des n-ten Käufers gemäß Ramp-Profil."""
+    if args.profile == "constant" or args.ramp <= 0:
+        return 0.0
+    if args.profile == "step":
+        per_step = max(1, args.users // args.steps)
+        return (index // per_step) * args.ramp / args.steps
+    return args.ramp * index / args.users
+
+
+async def run_shopper(index: int, args, make_client, stats: Stats, image: bytes, deadline: float):
+    await asyncio.sleep(start_delay(index, args))
+    rng = random.Random(args.seed + index)
+    names, weights = zip(*parse_mix(args.mix).items())
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(names, weights=weights)[0]
+        # Jede Iteration ist ein neuer Besucher mit leerer Session
+        async with make_client() as client:
+            shopper = VirtualShopper(client, stats, rng, image, double_submit=args.double_submit)
+            await getattr(shopper, scenario)()
+        stats.funnels[scenario] = stats.funnels.get(scenario, 0) + 1
+        if args.think_ms:
+            await asyncio.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+
+async def count_rows() -> Dict[str, int]:
+    from sqlalchemy import func, select
+    from db import AsyncSessionLocal
+    from db_models import Customer, Order, OrderItem
+
+    async with AsyncSessionLocal() as db:
+        return {
+            model.__tablename__: (await db.execute(select(func.count()).select_from(model))).scalar()
+            for model in (Customer, Order, OrderItem)
+        }
+
+
+def print_report(stats: Stats, elapsed: float, rows: Optional[Dict[str, int]]):
+    total = sum(len(values) for values in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    print(f"\nLaufzeit {elapsed:.1f}s, {total} Requests, {total / elapsed:.1f} req/s, "
+          f"Fehler {errors} ({100 * errors / max(total, 1):.2f}%)")
+    print(f"Durchläufe: {stats.funnels}")
+    print(f"{'Route':<28}{'Anzahl':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Fehler %':>10}")
+    for route in sorted(stats.latencies):
+        values = sorted(stats.latencies[route])
+        error_rate = 100 * stats.errors.get(route, 0) / len(values)
+        print(f"{route:<28}{len(values):>8}{len(values) / elapsed:>9.1f}"
+              f"{percentile(values, 50) * 1000:>9.1f}{percentile(values, 95) * 1000:>9.1f}"
+              f"{percentile(values, 99) * 1000:>9.1f}{error_rate:>10.2f}")
+    if rows is not None:
+        print("DB-Zeilen: " + ", ".join(f"{table}={count}" for table, count in rows.items()))
+
+
+async def run(args):
+    stats = Stats()
+    image = open(args.image, "rb").read() if args.image else make_test_image()
+
+    async def drive(make_client):
+        started = time.perf_counter()
+        deadline = started + args.ramp + args.duration
+        await asyncio.gather(*[
+            run_shopper(i, args, make_client, stats, image, deadline) for i in range(args.users)
+        ])
+        return time.perf_counter() - started
+
+    if args.base_url:
+        limits = httpx.Limits(max_connections=args.users)
+        elapsed = await drive(lambda: httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout))
+        rows = await count_rows() if args.database_url else None
+    else:
+        from main import app
+
+        # Lifespan selbst ausführen – ASGITransport startet ihn nicht
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            elapsed = await drive(lambda: httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout))
+        rows = await count_rows()
+
+    print_report(stats, elapsed, rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Lasttest für den Kauf-Funnel des Brownie-Shops.")
+    parser.add_argument("--users", type=int, default=20, help="Anzahl paralleler virtueller Käufer")
+    parser.add_argument("--duration", type=float, default=30, help="Sekunden unter Volllast (nach dem Ramp-up)")
+    parser.add_argument("--ramp", type=float, default=5, help="Sekunden für den Ramp-up")
+    parser.add_argument("--profile", choices=["linear", "step", "constant"], default="linear")
+    parser.add_argument("--steps", type=int, default=4, help="Stufen für --profile step")
+    parser.add_argument("--mix", default="purchase=0.3,cart=0.3,browse=0.4", help="Szenario-Gewichte")
+    parser.add_argument("--think-ms", type=float, default=0, help="mittlere Denkzeit zwischen Durchläufen")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--double-submit", type=float, default=0,
+                        help="Anteil der Käufe, deren Checkout doppelt abgeschickt wird (Idempotenz-Test)")
+    parser.add_argument("--image", help="Bilddatei für /upload (Standard: erzeugtes 256x256-PNG)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--base-url", help="gegen laufenden Server testen statt in-process")
+    parser.add_argument("--database-url", help=f"DB für Zeilenzählung (in-process Standard: {DEFAULT_DATABASE_URL})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url:
+        os.environ["SHOP_DATABASE_URL"] = args.database_url
+    elif not args.base_url:
+        os.environ.setdefault("SHOP_DATABASE_URL", DEFAULT_DATABASE_URL)
+    asyncio.run(run(args))
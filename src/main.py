@@ -1,12 +1,15 @@
 import asyncio
+import threading
 import time
+from concurrent.futures.process import BrokenProcessPool
 from contextlib import asynccontextmanager
 import uuid
+from datetime import date, datetime
 from fastapi import Depends, FastAPI, File, UploadFile, Request
 
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
@@ -20,11 +23,24 @@ import uvicorn
 from typing import Optional, List, Dict
 from fastapi import Form, status
 from fastapi.responses import RedirectResponse
-from functions import calculate_totals, format_currency, enrich_cart_item_prices
-from db import init_db, AsyncSessionLocal, engine, reset_db, drop_db, seed_initial_data
+from functions import calculate_totals, calculate_order_total, format_currency, enrich_cart_item_prices, render_cart_items_html
+from db import init_db, AsyncSessionLocal, engine, reset_db, drop_db, seed_initial_data, prepare_database
 import schema
 from db_models import Customer, Order, Product, OrderItem
-from edges import prewitt_edge_detection 
+from image_pool import start_image_pool, shutdown_image_pool
+from image_client import IMAGE_SERVICE_URL, close_image_client, render_edges, start_image_client
+from rollups import apply_order_to_rollups, fetch_daily_report
+from order_journal import ORDER_WRITE_BEHIND, order_journal
+import timing
+from timing import TIMING_ENABLED, TimingMiddleware, SessionTimingBoundary, stage
+import sql_stats
+from sql_stats import QueryStatsMiddleware, install_query_stats
+from profiler import ProfilerMiddleware, request_profiler, sample_stacks
+from auth import require_admin
+from compression import COMPRESSION_ENABLED, CompressionMiddleware
+from blobstore import guess_media_type, has_blob, iter_blob, put_blob
+from idempotency import checkout_keys, find_order_id, is_valid_key
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 SECRET_KEY = "key"
@@ -39,22 +55,34 @@ async def lifespan(app: FastAPI):
     FastAPI Lifespan Kontextmanager (ersetzt @app.on_event).
     Startup-Code läuft vor dem Yield, Shutdown-Code danach.
     """
-    # STARTUP-CODE: Datenbank-Initialisierung
+    # STARTUP-CODE: Datenbank-Initialisierung (Tabellen anlegen + Seeding).
+    # Läuft in jedem Worker, ist aber per Dateisperre serialisiert und löscht nichts.
     print("Starte Datenbank-Initialisierung...")
-    await init_db()
+    await prepare_database()
     print("Datenbank bereit.")
 
-    print("Starte Initiales Seeding der Daten...")
-    await seed_initial_data()
-    print("Initiales Seeding abgeschlossen.")
+    if IMAGE_SERVICE_URL:
+        # Bilder rechnet der Dienst; der lokale Rückfall läuft im Thread statt in einem eigenen Pool
+        start_image_client()
+    else:
+        start_image_pool()
+
+    if ORDER_WRITE_BEHIND:
+        print("Starte Write-Behind-Order-Journal...")
+        await order_journal.start()
 
     # Der Yield-Befehl signalisiert, dass die Anwendung bereit ist,
     # Anfragen anzunehmen.
     yield
     
-    # SHUTDOWN-CODE (falls benötigt, z.B. zum Schließen von Engines)
-    # Hier nicht notwendig, da SQLAlchemy die Engine verwaltet.
-    pass
+    # SHUTDOWN-CODE: offene Journal-Einträge in die DB schreiben
+    if ORDER_WRITE_BEHIND:
+        await order_journal.stop()
+
+    await close_image_client()
+    shutdown_image_pool()
+    # Verbindungen des Pools sauber schließen
+    await engine.dispose()
 
 # FastAPI-Initialisierung mit dem Lifespan-Manager
 app = FastAPI(
@@ -83,6 +111,10 @@ async def get_async_db():
 app.mount("/data", StaticFiles(directory="data"), name="data")
 templates = Jinja2Templates(directory="static/")
 
+# gzip/brotli für HTML, JSON und Text (innerste Middleware, Bilder bleiben unkomprimiert)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://localhost:8000"],
@@ -91,6 +123,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stage-Timing (SHOP_TIMING=1): die Grenze liegt direkt innerhalb der SessionMiddleware,
+# TimingMiddleware ganz außen – so wird das Laden/Signieren des Session-Cookies messbar
+if TIMING_ENABLED:
+    app.add_middleware(SessionTimingBoundary)
+
 app.add_middleware(
     SessionMiddleware,
     secret_key=SECRET_KEY,
@@ -98,6 +135,16 @@ app.add_middleware(
     max_age=3600,
 )
 
+# SQL-Abfragestatistik pro Request (Anzahl, DB-Zeit, N+1-Warnung, Slow-Query-Log)
+install_query_stats(engine)
+app.add_middleware(QueryStatsMiddleware)
+
+# On-Demand-Profiling (nur mit SHOP_ADMIN_TOKEN nutzbar, im Leerlauf praktisch kostenlos)
+app.add_middleware(ProfilerMiddleware)
+
+if TIMING_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
@@ -127,15 +174,30 @@ async def shop(request: Request):
 
 @app.post("/upload")
 async def process_image(request: Request, file: UploadFile = File(...)):
-    image_bytes = await file.read()
-    image_file_like = io.BytesIO(image_bytes)
-    image_file_like.seek(0)
-    edges_image = prewitt_edge_detection(image_file_like.read())
-    img_byte_arr = io.BytesIO()
-    edges_image.save(img_byte_arr, format='PNG')
-    encoded_img = base64.b64encode(img_byte_arr.getvalue()).decode("utf-8")
+    # Multipart-Parsing passiert vor dem Endpunkt (FastAPI-Dependency-Auflösung)
+    timing.lap("multipart")
+    with stage("multipart"):
+        image_bytes = await file.read()
+    # CPU-lastige Kantenerkennung außerhalb des Event-Loops (Dienst, Prozess-Pool bzw. Thread)
+    try:
+        png_bytes = await render_edges(image_bytes)
+    except (OSError, ValueError):
+        # Nicht lesbare oder abgeschnittene Bilder (PIL) bzw. vom Bild-Dienst abgelehnt
+        raise HTTPException(status_code=400, detail="Datei ist kein lesbares Bild.")
+    except BrokenProcessPool:
+        raise HTTPException(status_code=503, detail="Bildverarbeitung wird neu gestartet.")
+    # Original und Maske einmalig im Blob-Store ablegen; die Bestellung verweist per Hash
+    with stage("blob_store"):
+        original_hash = await asyncio.to_thread(put_blob, image_bytes)
+        mask_hash = await asyncio.to_thread(put_blob, png_bytes)
+    with stage("base64"):
+        encoded_img = base64.b64encode(png_bytes).decode("utf-8")
     image_src = f"data:image/png;base64,{encoded_img}"
-    return JSONResponse(content={"processed_image_src": image_src})
+    return JSONResponse(content={
+        "processed_image_src": image_src,
+        "original_hash": original_hash,
+        "mask_hash": mask_hash,
+    })
 
 
 @app.get("/cart", response_class=HTMLResponse)
@@ -152,73 +214,8 @@ async def view_cart(request: Request):
     totals = calculate_totals(cart_items) 
     total_savings = totals.get('total_discount', 0.0)
     
-    items_html = ""
-    total_items_count = 0
+    items_html, total_items_count = render_cart_items_html(cart_items)
 
-    for item in cart_items:
-        # Hier die korrigierten Variablen abrufen
-        item_id = item.get("session_item_id")
-        quantity = item.get('quantity', 0)
-        total_items_count += quantity
-
-        personalized_price = f"{item['total_item_price']:.2f}"
-        discount_amount = item.get("total_discount", 0.0) 
-        unit_price_discounted = item.get("personalized_unit_price_after_discount", item['base_price'])
-        
-        # Beschreibung und Rabatt-Badge
-        is_sc = item['product_id'] == 2
-        is_qty_discount = item['product_id'] == 1 and discount_amount > 0.01
-
-        if is_sc:
-            description = "Restposten, Form & Füllung zufällig"
-            discount_badge = "<p class='discount-info'>🎉 **25% Rabatt** angewendet!</p>"
-            unit_price_info = f"<p class='unit-price-info'>Stück: <span class='original-price'>({item['base_price']:.2f} €)</span> {unit_price_discounted:.2f} €</p>"
-            title_class = "second-chance-title"
-            title_text = "Second-Chance Brownies"
-        else:
-            description = (
-                f"Größe: <strong>{item['size'].capitalize()}</strong>, "
-                f"Form: <strong>{item['shape'].capitalize()}</strong>, "
-                f"Füllung: <em>{item['filling'] or 'Keine'}</em>, "
-                f"Toppings: <em>{item['toppings'] or 'Keine'}</em>"
-            )
-            discount_badge = ""
-            if is_qty_discount:
-                 discount_text = "Mengenrabatt (5%)" if unit_price_discounted > item['base_price'] * 0.91 else "Mengenrabatt (10%)"
-                 discount_badge = f"<p class='discount-info'>🎉 {discount_text} angewendet!</p>"
-                 original_unit_price_str = f"({item['base_price']:.2f} €)"
-                 unit_price_info = f"<p class='unit-price-info'>Stück: <span class='original-price'>{original_unit_price_str}</span> {unit_price_discounted:.2f} €</p>"
-            else:
-                 unit_price_info = f"<p class='unit-price-info'>Stück: {item['base_price']:.2f} €</p>"
-            title_class = ""
-            title_text = item['product_name']
-
-
-        items_html += f"""
-        <div class='cart-item' id='item-{item_id}'>
-            <div class='item-details'>
-                <h4 class='{title_class}'>{title_text}</h4>
-                <p class='description'>{description}</p>
-                {unit_price_info}
-                {discount_badge}
-            </div>
-            
-            <form action='/cart/update/{item_id}' method='post' class='quantity-form'>
-                <input type='hidden' name='product_id' value='{item['product_id']}'>
-                <input type='number' name='new_quantity' value='{quantity}' min='0' class='qty-input'>
-                <button type='submit' class='btn-update' title='Menge aktualisieren'>✓</button>
-            </form>
-            
-            <div class='item-price'>
-                <strong>{personalized_price} €</strong>
-            </div>
-            
-            <form action='/cart/remove/{item_id}' method='post' class='remove-form'>
-                <button type='submit' class='btn-remove' title='Artikel löschen'>&times;</button>
-            </form>
-        </div>
-        """
-        
     totals['subtotal'] = format_currency(totals['subtotal'])
     totals['shipping'] = format_currency(totals['shipping'])
     totals['tax'] = format_currency(totals['tax'])
@@ -238,6 +235,15 @@ async def view_cart(request: Request):
     )
 
 
+def _store_cart(request: Request, cart_items: List[Dict]):
+    """
+    Speichert den geänderten Warenkorb. Der Checkout-Schlüssel gehört zum alten
+    Inhalt und wird verworfen – die Checkout-Seite vergibt dann einen neuen.
+    """
+    request.session["cart"] = cart_items
+    request.session.pop("checkout_key", None)
+
+
 @app.post("/cart/update/{session_item_id}")
 async def update_cart_item(
     request: Request, 
@@ -263,7 +269,7 @@ async def update_cart_item(
 
             break
 
-    request.session["cart"] = cart_items
+    _store_cart(request, cart_items)
     
     return RedirectResponse(url="/cart", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -275,7 +281,7 @@ async def remove_cart_item(request: Request, session_item_id: str):
     
     cart_items = [item for item in cart_items if item.get("session_item_id") != session_item_id]
     
-    request.session["cart"] = cart_items
+    _store_cart(request, cart_items)
     
     return RedirectResponse(url="/cart", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -300,7 +306,9 @@ async def add_to_cart(
     filling: Optional[str] = Form(None),
     toppings: Optional[str] = Form(None),
     quantity: int = Form(1, ge=1),
-    old_brownies_qty: int = Form(0, ge=0, alias="old_brownies_qty") 
+    old_brownies_qty: int = Form(0, ge=0, alias="old_brownies_qty"),
+    engraving_original_hash: Optional[str] = Form(None),
+    engraving_mask_hash: Optional[str] = Form(None),
 ):
     """Speichert den Custom Brownie (product_id=1) und optional Second-Chance (product_id=2) in der Session und leitet weiter."""
     
@@ -308,6 +316,10 @@ async def add_to_cart(
         request.session["cart"] = []
     
     cart: List[Dict] = request.session["cart"]
+
+    # Gravur-Verweise nur übernehmen, wenn die Blobs tatsächlich hochgeladen wurden
+    if not (has_blob(engraving_original_hash) and has_blob(engraving_mask_hash)):
+        engraving_original_hash = engraving_mask_hash = None
     
     # 1. Hauptprodukt (Custom Brownie)
     if quantity > 0:
@@ -319,6 +331,8 @@ async def add_to_cart(
             "shape": shape,
             "filling": filling,
             "toppings": toppings,
+            "engraving_original_hash": engraving_original_hash,
+            "engraving_mask_hash": engraving_mask_hash,
         })
 
     # 2. Second-Chance Brownie (Separater Artikel)
@@ -333,7 +347,7 @@ async def add_to_cart(
             "toppings": "N/A",
         })
         
-    request.session["cart"] = cart
+    _store_cart(request, cart)
     
     return RedirectResponse(url="/cart", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -370,7 +384,18 @@ async def checkout_page(request: Request):
 
     totals_formatted = {k: format_currency(v) for k, v in totals.items()}
 
-    return templates.TemplateResponse("checkout.html", {"request": request, "summary_html": summary_html, "totals": totals_formatted})
+    # Idempotenz-Schlüssel für diesen Checkout (bleibt bei Reload der Seite gleich)
+    idempotency_key = request.session.get("checkout_key")
+    if not idempotency_key:
+        idempotency_key = uuid.uuid4().hex
+        request.session["checkout_key"] = idempotency_key
+
+    return templates.TemplateResponse("checkout.html", {
+        "request": request,
+        "summary_html": summary_html,
+        "totals": totals_formatted,
+        "idempotency_key": idempotency_key,
+    })
 
 
 @app.post("/checkout", response_class=RedirectResponse)
@@ -381,10 +406,28 @@ async def process_checkout(
     email: str = Form(...),
     address: str = Form(...),
     zip_code: str = Form(..., alias="zip"),
-    payment_method: str = Form(..., alias="payment_method")
+    payment_method: str = Form(..., alias="payment_method"),
+    idempotency_key: Optional[str] = Form(None),
 ):
     """Verarbeitet die Bestellung, speichert alle Daten in der DB und leert den Warenkorb."""
-    
+
+    if not is_valid_key(idempotency_key):
+        idempotency_key = None
+
+    # 0. WIEDERHOLTE ABSENDUNG: ursprüngliche Bestellung bestätigen, nichts neu schreiben
+    #    (vor der Warenkorb-Prüfung, da der Warenkorb nach der ersten Absendung leer ist)
+    if idempotency_key:
+        existing_order_id = await find_order_id(db, idempotency_key)
+        if existing_order_id is not None:
+            if request.session.get("cart") and request.session.get("checkout_key") != idempotency_key:
+                # Formular zu einem inzwischen geänderten Warenkorb: nicht die alte
+                # Bestellung bestätigen und dabei den neuen Warenkorb leeren
+                raise HTTPException(
+                    status_code=409,
+                    detail="Der Warenkorb wurde seit dem Laden der Checkout-Seite geändert. Bitte Seite neu laden.",
+                )
+            return _checkout_done(request, existing_order_id)
+
     cart_items: List[Dict] = request.session.get("cart", [])
 
     if not cart_items:
@@ -392,7 +435,30 @@ async def process_checkout(
     
     # 1. Warenkorb-Items mit aktuellen Preisen anreichern
     cart_items = [enrich_cart_item_prices(item) for item in cart_items]
-    
+
+    # WRITE-BEHIND-MODUS: Bestellung ins Journal schreiben und sofort bestätigen
+    if ORDER_WRITE_BEHIND:
+        record = {
+            "order_date": datetime.now().isoformat(),
+            "customer": {"name": name, "email": email, "address": f"{address}, {zip_code}"},
+            "total_amount": calculate_order_total(cart_items),
+            "items": [
+                {key: item.get(key) for key in (
+                    "product_id", "quantity", "size", "shape", "filling", "toppings", "total_item_price",
+                    "engraving_original_hash", "engraving_mask_hash",
+                )}
+                for item in cart_items
+            ],
+            "idempotency_key": idempotency_key,
+        }
+        try:
+            with stage("journal"):
+                order_id = await order_journal.submit(record)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Bestellung ungültig: {e}")
+        print(f"*** Bestellung {order_id} im Journal gesichert. ***")
+        return _checkout_done(request, order_id)
+
     total_amount_db = 0.0
     products_map: Dict[int, Product] = {}
     
@@ -419,21 +485,16 @@ async def process_checkout(
             products_map[product.id] = product
 
         # 4. PREISBERECHNUNG (Basierend auf den angereicherten Session-Preisen)
-        for item in cart_items:
-            # item['total_item_price'] enthält bereits den korrekten Gesamtpreis
-            total_amount_db += item['total_item_price']
-
-        # Hinzufügen von Versand und Steuern
-        subtotal = total_amount_db
-        tax = subtotal * TAX_RATE
-        total_amount_db = subtotal + SHIPPING_COST + tax
-        total_amount_db = round(total_amount_db, 2)
+        total_amount_db = calculate_order_total(cart_items)
 
         # 5. BESTELLUNG (Order) ANLEGEN
+        order_date = datetime.now()
         new_order = Order(
             customer=customer, 
             total_amount=total_amount_db, 
-            status="Processing"
+            order_date=order_date,
+            status="Processing",
+            idempotency_key=idempotency_key,
         )
         db.add(new_order)
         await db.flush() 
@@ -451,26 +512,51 @@ async def process_checkout(
                 size=item.get("size"), 
                 shape=item.get("shape"), 
                 filling=item.get("filling"), 
-                toppings=item.get("toppings") 
+                toppings=item.get("toppings"),
+                engraving_original_hash=item.get("engraving_original_hash"),
+                engraving_mask_hash=item.get("engraving_mask_hash"),
+                line_total=item.get("total_item_price"),
             )
             db.add(new_item)
+
+        # 7. REPORTING-ROLLUPS in derselben Transaktion fortschreiben (sperrt die
+        #    Tageszeile bis zum Commit – daher als letzter Schritt, siehe rollups.py)
+        await apply_order_to_rollups(db, order_date, cart_items, total_amount_db)
             
-        # 7. COMMIT
+        # 8. COMMIT
         await db.commit() 
         print(f"*** Bestelltransaktion {order_id} erfolgreich abgeschlossen. ***")
 
-        # 8. WARENKORB LEEREN und WEITERLEITEN
-        del request.session["cart"]
-        return RedirectResponse(url=f"/confirmation?order_id={order_id}", status_code=status.HTTP_303_SEE_OTHER)
+        if idempotency_key:
+            checkout_keys.put(idempotency_key, order_id)
+
+        # 9. WARENKORB LEEREN und WEITERLEITEN
+        return _checkout_done(request, order_id)
 
     except HTTPException:
         await db.rollback() 
         raise
+    except IntegrityError:
+        await db.rollback()
+        # Parallele Absendung mit demselben Schlüssel war schneller: deren Bestellung bestätigen
+        existing_order_id = await find_order_id(db, idempotency_key) if idempotency_key else None
+        if existing_order_id is None:
+            print("Integritätsfehler beim Checkout ohne passende Bestellung.")
+            raise HTTPException(status_code=500, detail="Ein interner Fehler ist während des Bestellvorgangs aufgetreten.")
+        print(f"*** Wiederholte Absendung erkannt, Bestellung {existing_order_id} bestätigt. ***")
+        return _checkout_done(request, existing_order_id)
     except Exception as e:
         await db.rollback() 
         print(f"UNERWARTETER Fehler beim Checkout: {e}")
         raise HTTPException(status_code=500, detail="Ein interner Fehler ist während des Bestellvorgangs aufgetreten.")
 
+def _checkout_done(request: Request, order_id: int) -> RedirectResponse:
+    """Leert Warenkorb und Checkout-Schlüssel und leitet zur Bestätigung weiter."""
+    request.session.pop("cart", None)
+    request.session.pop("checkout_key", None)
+    return RedirectResponse(url=f"/confirmation?order_id={order_id}", status_code=status.HTTP_303_SEE_OTHER)
+
+
 @app.get("/confirmation", response_class=HTMLResponse)
 async def confirmation_page(request: Request, order_id: Optional[str] = None):
     """Bestätigt dem Benutzer den erfolgreichen Abschluss der Bestellung."""
@@ -480,5 +566,106 @@ async def confirmation_page(request: Request, order_id: Optional[str] = None):
     return templates.TemplateResponse("confirmation.html", {"request": request, "order_text": order_text})
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latenz-Histogramme pro Route und Stage sowie SQL-Zähler im Prometheus-Textformat."""
+    return PlainTextResponse(
+        timing.render_metrics() + sql_stats.render_metrics(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+# ----------------------------------------------------------------------
+# ADMIN: Profiling laufender Worker (Header X-Admin-Token)
+# ----------------------------------------------------------------------
+
+@app.get("/admin/profile/stacks", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_stacks(seconds: float = 10.0, interval_ms: float = 5.0, all_threads: bool = False):
+    """Sampelt die Stacks dieses Workers und liefert Collapsed Stacks für Flame Graphs."""
+    # Standard: nur der Event-Loop-Thread, in dem auch dieser Handler läuft
+    thread_ids = None if all_threads else {threading.get_ident()}
+    try:
+        collapsed = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000, thread_ids)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(collapsed)
+
+
+@app.post("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def arm_request_profiler(route: str, count: int = 10):
+    """Profiliert die nächsten `count` Requests auf dem Pfad `route` mit cProfile."""
+    if count < 1:
+        raise HTTPException(status_code=400, detail="count muss mindestens 1 sein.")
+    try:
+        request_profiler.arm(route, count)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return request_profiler.status()
+
+
+@app.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+async def get_request_profile(format: str = "status"):
+    """Status (format=status), Textauszug (format=text) oder pstats-Dump (format=pstats)."""
+    if format == "status":
+        return request_profiler.status()
+    if request_profiler.result is None:
+        raise HTTPException(status_code=404, detail="Noch kein Profil verfügbar.")
+    if format == "text":
+        return PlainTextResponse(request_profiler.summary())
+    if format == "pstats":
+        return Response(
+            request_profiler.dump(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=requests.pstats"},
+        )
+    raise HTTPException(status_code=400, detail="format muss status, text oder pstats sein.")
+
+
+# ----------------------------------------------------------------------
+# PRODUKTION: Gravur-Bilder für die Backstube (Header X-Admin-Token)
+# ----------------------------------------------------------------------
+
+@app.get("/production/orders/{order_id}/engravings", dependencies=[Depends(require_admin)])
+async def order_engravings(order_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Listet die Gravur-Verweise aller Positionen einer Bestellung."""
+    result = await db.execute(
+        select(OrderItem).filter(OrderItem.order_id == order_id, OrderItem.engraving_mask_hash.is_not(None))
+    )
+    return [
+        {
+            "order_item_id": item.id,
+            "quantity": item.quantity,
+            "original_url": f"/production/engravings/{item.engraving_original_hash}",
+            "mask_url": f"/production/engravings/{item.engraving_mask_hash}",
+        }
+        for item in result.scalars()
+    ]
+
+
+@app.get("/production/engravings/{digest}", dependencies=[Depends(require_admin)])
+async def engraving_blob(digest: str):
+    """Liefert ein Original bzw. eine Kantenmaske gestreamt aus dem Blob-Store."""
+    if not has_blob(digest):
+        raise HTTPException(status_code=404, detail="Bild nicht gefunden.")
+    return StreamingResponse(
+        iter_blob(digest),
+        media_type=guess_media_type(digest),
+        # Inhalt ist über den Hash unveränderlich
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+    )
+
+
+@app.get("/api/reports/daily", dependencies=[Depends(require_admin)])
+async def daily_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Tagesmengen pro Produktkonfiguration und Tagesumsatz (liest nur die Rollup-Tabellen)."""
+    return await fetch_daily_report(db, start, end)
+
+
 if __name__ == "__main__":
-    uvicorn.run("shop_backend:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Start inkl. Worker-, Event-Loop- und Shutdown-Konfiguration: siehe serve.py
+    import serve
+    serve.main()
\ No newline at end of file
@@ -0,0 +1,443 @@
+import asyncio
+import fcntl
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+from db import AsyncSessionLocal
+from db_models import Customer, Order, OrderItem
+from idempotency import checkout_keys
+from rollups import apply_order_to_rollups
+
+# ----------------------------------------------------------------------
+# Write-Behind-Bestellqueue mit Group Commit
+# Validierte Bestellungen werden in ein lokales Append-only-Journal
+# geschrieben (fsync) und sofort bestätigt. Ein Hintergrund-Writer fasst
+# viele Bestellungen zu einer Transaktion zusammen. Beim Start werden
+# noch nicht geschriebene Einträge aus dem Journal wiederhergestellt.
+#
+# Achtung: Die Bestell-IDs werden lokal vergeben. Der Modus ist daher nur
+# für EINEN Prozess gedacht, der Bestellungen in die Datenbank schreibt –
+# eine Sperrdatei neben dem Journal lässt jeden weiteren Start scheitern.
+# ----------------------------------------------------------------------
+
+ORDER_WRITE_BEHIND = os.environ.get("SHOP_ORDER_WRITE_BEHIND", "0") == "1"
+JOURNAL_PATH = os.environ.get("SHOP_ORDER_JOURNAL", "order_journal.jsonl")
+# Einträge, die die DB dauerhaft ablehnt, landen hier statt die Queue zu blockieren
+DEAD_LETTER_PATH = os.environ.get("SHOP_ORDER_DEAD_LETTER", "order_journal.dead.jsonl")
+
+GROUP_COMMIT_MAX_ORDERS = 200   # maximale Bestellungen pro Transaktion
+GROUP_COMMIT_WINDOW = 0.05      # Sekunden, die auf weitere Bestellungen gewartet wird
+RETRY_DELAY = 1.0               # Sekunden zwischen Wiederholungen bei DB-Fehlern
+# Höchstens so lange wartet das Herunterfahren auf den Writer (Uvicorns
+# --graceful-timeout gilt nicht für den Lifespan); der Rest bleibt im Journal
+STOP_TIMEOUT = float(os.environ.get("SHOP_ORDER_JOURNAL_STOP_TIMEOUT", "30"))
+
+# Vorübergehende Fehler (Verbindung, Sperren): ganzen Stapel später erneut versuchen.
+# Alle anderen gelten als dauerhaft und führen zum Dead-Letter des einzelnen Eintrags.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError, OSError, asyncio.TimeoutError)
+
+_CUSTOMER_COLUMNS = ("name", "email", "address")
+_ITEM_COLUMNS = ("size", "shape", "filling", "toppings", "engraving_original_hash", "engraving_mask_hash")
+
+
+def _check_length(value, attribute, label: str):
+    limit = attribute.type.length
+    if value is not None and len(str(value)) > limit:
+        raise ValueError(f"{label} ist länger als {limit} Zeichen.")
+
+
+def validate_order_record(record: Dict):
+    """
+    Prüft einen Eintrag gegen die Spaltengrenzen, bevor er bestätigt wird –
+    was die DB (z.B. MySQL im Strict Mode) ablehnen würde, darf nicht ins Journal.
+    """
+    customer = record.get("customer") or {}
+    for field in _CUSTOMER_COLUMNS:
+        if not customer.get(field):
+            raise ValueError(f"Kundenfeld '{field}' fehlt.")
+        _check_length(customer[field], getattr(Customer, field), f"Kundenfeld '{field}'")
+    _check_length(record.get("idempotency_key"), Order.idempotency_key, "Idempotenz-Schlüssel")
+
+    if not record.get("items"):
+        raise ValueError("Bestellung ohne Positionen.")
+    for item in record["items"]:
+        if not isinstance(item.get("product_id"), int) or not isinstance(item.get("quantity"), int):
+            raise ValueError("Position ohne gültige Produkt-ID oder Menge.")
+        for field in _ITEM_COLUMNS:
+            _check_length(item.get(field), getattr(OrderItem, field), f"Feld '{field}'")
+
+
+async def persist_order_records(records: List[Dict]) -> List[Tuple[Dict, str]]:
+    """
+    Schreibt einen Stapel Journal-Einträge in einer einzigen Transaktion.
+    Gibt die Einträge zurück, deren Bestell-ID schon von einer ANDEREN
+    Bestellung belegt ist (nicht geschrieben, gehören ins Dead-Letter).
+    """
+    async with AsyncSessionLocal() as db:
+        order_ids = [record["order_id"] for record in records]
+        existing = {
+            order_id: (key, email)
+            for order_id, key, email in await db.execute(
+                select(Order.id, Order.idempotency_key, Customer.email)
+                .join(Customer, Order.customer_id == Customer.c_id)
+                .filter(Order.id.in_(order_ids))
+            )
+        }
+        # Bereits geschriebene Einträge (z.B. nach Absturz vor dem Truncate) überspringen –
+        # aber nur, wenn die gespeicherte Bestellung wirklich dieselbe ist
+        conflicts = []
+        remaining = []
+        for record in records:
+            stored = existing.get(record["order_id"])
+            if stored is None:
+                remaining.append(record)
+            elif stored != (record.get("idempotency_key"), record["customer"]["email"]):
+                conflicts.append((record, f"Bestell-ID {record['order_id']} ist von einer anderen Bestellung belegt."))
+        records = remaining
+
+        # Idempotenz-Schlüssel, die schon eine Bestellung haben, würden den Unique-Constraint verletzen
+        keys = [record["idempotency_key"] for record in records if record.get("idempotency_key")]
+        seen_keys = set((await db.execute(
+            select(Order.idempotency_key).filter(Order.idempotency_key.in_(keys))
+        )).scalars()) if keys else set()
+        unique_records = []
+        for record in records:
+            key = record.get("idempotency_key")
+            if key in seen_keys:
+                print(f"Order-Journal: Bestellung {record['order_id']} ist ein Duplikat und wird übersprungen.")
+                continue
+            if key:
+                seen_keys.add(key)
+            unique_records.append(record)
+        records = unique_records
+        if not records:
+            return conflicts
+
+        emails = {record["customer"]["email"] for record in records}
+        customers = {
+            customer.email: customer
+            for customer in (await db.execute(
+                select(Customer).filter(Customer.email.in_(emails))
+            )).scalars()
+        }
+
+        for record in records:
+            data = record["customer"]
+            customer = customers.get(data["email"])
+            if not customer:
+                customer = Customer(name=data["name"], email=data["email"], address=data["address"])
+                customers[data["email"]] = customer
+                db.add(customer)
+
+            order_date = datetime.fromisoformat(record["order_date"])
+            db.add(Order(
+                id=record["order_id"],
+                customer=customer,
+                total_amount=record["total_amount"],
+                order_date=order_date,
+                status="Processing",
+                idempotency_key=record.get("idempotency_key"),
+            ))
+            for item in record["items"]:
+                db.add(OrderItem(
+                    order_id=record["order_id"],
+                    product_id=item["product_id"],
+                    quantity=item.get("quantity", 1),
+                    size=item.get("size"),
+                    shape=item.get("shape"),
+                    filling=item.get("filling"),
+                    toppings=item.get("toppings"),
+                    engraving_original_hash=item.get("engraving_original_hash"),
+                    engraving_mask_hash=item.get("engraving_mask_hash"),
+                    line_total=item.get("total_item_price"),
+                ))
+
+        await db.flush()
+        for record in records:
+            order_date = datetime.fromisoformat(record["order_date"])
+            await apply_order_to_rollups(db, order_date, record["items"], record["total_amount"])
+
+        await db.commit()
+    return conflicts
+
+
+class OrderJournal:
+    """Append-only-Journal (JSON Lines) plus Hintergrund-Writer."""
+
+    def __init__(self, path: str, dead_letter_path: str):
+        self.path = path
+        self.dead_letter_path = dead_letter_path
+        self.lock_path = f"{path}.lock"
+        self._lock_file = None
+        self._file = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._next_order_id = 1
+        # Sequenzzähler: geschrieben -> per fsync gesichert
+        self._written_seq = 0
+        self._synced_seq = 0
+        # Dateilänge bis zum letzten geschriebenen bzw. per fsync gesicherten Eintrag
+        self._written_offset = 0
+        self._synced_offset = 0
+        # Einträge in der Datei, die noch nicht in der DB (oder im Dead-Letter) sind
+        self._pending = 0
+
+    def _read_journal(self) -> Tuple[List[Dict], bool]:
+        """
+        Liest alle vollständigen Einträge. Eine abgeschnittene letzte Zeile
+        (Absturz mitten im Schreiben) wird ignoriert; der zweite Wert ist
+        False, wenn die Datei deshalb bereinigt werden muss.
+        """
+        if not os.path.exists(self.path):
+            return [], True
+        records = []
+        clean = True
+        with open(self.path, "rb") as journal_file:
+            for line in journal_file:
+                if not line.endswith(b"\n"):
+                    clean = False
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print("Order-Journal: unlesbare Zeile wird übersprungen.")
+                    clean = False
+        return records, clean
+
+    def _rewrite_journal(self, records: List[Dict]):
+        """Ersetzt das Journal atomar: temporäre Datei, fsync, rename, fsync des Verzeichnisses."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as journal_file:
+            for record in records:
+                journal_file.write(json.dumps(record).encode("utf-8") + b"\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(tmp_path, self.path)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _acquire_lock(self):
+        """Exklusive Sperre: ein zweiter Prozess würde dieselben IDs vergeben und fremde Einträge kürzen."""
+        lock_file = open(self.lock_path, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Order-Journal {self.path} wird bereits von einem anderen Prozess verwendet "
+                "(SHOP_ORDER_WRITE_BEHIND=1 nur mit genau einem Worker)."
+            )
+        self._lock_file = lock_file
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def start(self):
+        """Sperrt das Journal, stellt offene Einträge wieder her und startet den Hintergrund-Writer."""
+        self._acquire_lock()
+        try:
+            await self._recover()
+        except BaseException:
+            self._release_lock()
+            raise
+
+    async def _recover(self):
+        records, clean = self._read_journal()
+
+        async with AsyncSessionLocal() as db:
+            max_db_id = (await db.execute(select(func.max(Order.id)))).scalar() or 0
+        max_journal_id = max((record["order_id"] for record in records), default=0)
+        self._next_order_id = max(max_db_id, max_journal_id) + 1
+
+        # Abgeschnittene Zeile entfernen, ohne die bestätigten Einträge je ungesichert zu lassen
+        if not clean:
+            self._rewrite_journal(records)
+        # Ungepuffert: jeder Eintrag ist nach write() vollständig beim Betriebssystem
+        self._file = open(self.path, "ab", buffering=0)
+        self._written_offset = self._synced_offset = os.fstat(self._file.fileno()).st_size
+
+        self._queue = asyncio.Queue()
+        for record in records:
+            # Wiederholte Absendungen noch nicht geschriebener Bestellungen erkennen
+            if record.get("idempotency_key"):
+                checkout_keys.put(record["idempotency_key"], record["order_id"])
+            self._written_seq += 1
+            self._pending += 1
+            self._queue.put_nowait((self._written_seq, record))
+        self._synced_seq = self._written_seq
+
+        if records:
+            print(f"Order-Journal: {len(records)} Einträge werden wiederhergestellt.")
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def submit(self, record: Dict) -> int:
+        """
+        Vergibt die Bestell-ID, schreibt den Eintrag dauerhaft ins Journal
+        und gibt die ID zurück, sobald der fsync erfolgt ist. Ist der
+        Idempotenz-Schlüssel bereits bekannt, wird nur dessen ID geliefert.
+        Ungültige Einträge werden mit ValueError abgelehnt.
+        """
+        validate_order_record(record)
+
+        key = record.get("idempotency_key")
+        if key:
+            # Prüfen und Eintragen ohne await dazwischen: parallele Wiederholungen finden die ID
+            existing_order_id = checkout_keys.get(key)
+            if existing_order_id is not None:
+                return existing_order_id
+
+        record = dict(record, order_id=self._next_order_id)
+        self._next_order_id += 1
+        line = json.dumps(record).encode("utf-8") + b"\n"
+
+        try:
+            self._file.write(line)
+        except OSError:
+            # Teilweise geschriebene Zeile entfernen, sonst würde sie beim Neustart stören
+            os.ftruncate(self._file.fileno(), self._written_offset)
+            raise
+        self._written_offset += len(line)
+        self._written_seq += 1
+        self._pending += 1
+        seq = self._written_seq
+        if key:
+            checkout_keys.put(key, record["order_id"])
+
+        # Group fsync: alle bis dahin geschriebenen Einträge teilen sich einen fsync.
+        # Schlägt er fehl, hat _sync_round die Einträge wieder aus der Datei entfernt.
+        try:
+            while self._synced_seq < seq:
+                if self._sync_task is None:
+                    self._sync_task = asyncio.create_task(self._sync_round())
+                await asyncio.shield(self._sync_task)
+        except Exception:
+            if key:
+                checkout_keys.discard(key)
+            raise
+
+        self._queue.put_nowait((seq, record))
+        return record["order_id"]
+
+    async def _sync_round(self):
+        seq, offset = self._written_seq, self._written_offset
+        try:
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+            self._synced_seq, self._synced_offset = seq, offset
+        except OSError:
+            # Alle noch nicht gesicherten Einträge verwerfen: ihre Absender erhalten einen Fehler
+            # (auch die während des fsync hinzugekommenen, die auf diese Runde warten) und dürfen
+            # beim Neustart nicht doch noch als Bestellung auftauchen.
+            print("Order-Journal: fsync fehlgeschlagen, ungesicherte Einträge werden verworfen.")
+            os.ftruncate(self._file.fileno(), self._synced_offset)
+            self._pending -= self._written_seq - self._synced_seq
+            self._written_offset = self._synced_offset
+            self._synced_seq = self._written_seq
+            raise
+        finally:
+            self._sync_task = None
+
+    async def _next_batch(self) -> List:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + GROUP_COMMIT_WINDOW
+        while len(batch) < GROUP_COMMIT_MAX_ORDERS:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _dead_letter(self, record: Dict, error: Exception):
+        with open(self.dead_letter_path, "ab") as dead_file:
+            entry = {"record": record, "error": repr(error), "failed_at": datetime.now().isoformat()}
+            dead_file.write(json.dumps(entry).encode("utf-8") + b"\n")
+            dead_file.flush()
+            os.fsync(dead_file.fileno())
+        if record.get("idempotency_key"):
+            checkout_keys.discard(record["idempotency_key"])
+        print(f"Order-Journal: Bestellung {record.get('order_id')} dauerhaft abgelehnt ({error!r}), "
+              f"siehe {self.dead_letter_path}.")
+
+    async def _persist_batch(self, records: List[Dict]):
+        """Ganzer Stapel in einer Transaktion; bei dauerhaftem Fehler einzeln, Ausreißer ins Dead-Letter."""
+        try:
+            for record, reason in await persist_order_records(records):
+                self._dead_letter(record, ValueError(reason))
+            return
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            if len(records) == 1:
+                self._dead_letter(records[0], e)
+                return
+            print(f"Order-Journal: Stapel von {len(records)} Bestellungen abgelehnt ({e!r}), schreibe einzeln...")
+
+        # Bereits übernommene Einträge überspringt persist_order_records anhand der ID
+        for record in records:
+            try:
+                for conflict, reason in await persist_order_records([record]):
+                    self._dead_letter(conflict, ValueError(reason))
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                self._dead_letter(record, e)
+
+    async def _writer(self):
+        while True:
+            batch = await self._next_batch()
+            while True:
+                try:
+                    await self._persist_batch([record for _, record in batch])
+                    break
+                except Exception as e:
+                    print(f"Order-Journal: Schreiben von {len(batch)} Bestellungen fehlgeschlagen ({e!r}), neuer Versuch...")
+                    await asyncio.sleep(RETRY_DELAY)
+
+            self._pending -= len(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+            # Journal kürzen, wenn alles Geschriebene in der DB angekommen ist
+            if self._pending == 0 and self._sync_task is None:
+                self._file.truncate(0)
+                self._written_offset = self._synced_offset = 0
+
+    async def stop(self, timeout: float = STOP_TIMEOUT):
+        """
+        Schreibt alle offenen Bestellungen und beendet den Writer. Ist die DB
+        nach `timeout` Sekunden nicht erreichbar, bleiben die Einträge im
+        Journal; start() übernimmt sie beim nächsten Hochfahren.
+        """
+        if self._writer_task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Order-Journal: {self._pending} Bestellungen nach {timeout:.0f}s nicht geschrieben, "
+                  "sie bleiben im Journal und werden beim nächsten Start übernommen.")
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._writer_task = None
+        self._file.close()
+        self._release_lock()
+
+
+order_journal = OrderJournal(JOURNAL_PATH, DEAD_LETTER_PATH)
@@ -0,0 +1,159 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# ----------------------------------------------------------------------
+# On-Demand-Profiling für laufende Worker
+# Zwei Werkzeuge, beide nur mit gesetztem SHOP_ADMIN_TOKEN verfügbar (auth.py):
+#  1. Stack-Sampling: ein Hintergrund-Thread liest für eine gewünschte
+#     Dauer periodisch die Stacks (sys._current_frames) und liefert
+#     Collapsed Stacks für Flame Graphs (flamegraph.pl, speedscope).
+#  2. Request-Profiling: cProfile für die nächsten N Requests einer Route,
+#     abrufbar als pstats-Dump oder Textauszug.
+# Im Leerlauf kostet das nur eine Attributprüfung pro Request.
+# ----------------------------------------------------------------------
+
+MAX_SAMPLE_SECONDS = 60.0
+MIN_INTERVAL_SECONDS = 0.001
+
+
+# ----------------------------------------------------------------------
+# 1. Stack-Sampling
+# ----------------------------------------------------------------------
+
+_sampling_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def sample_stacks(seconds: float, interval: float, thread_ids: Optional[set] = None) -> str:
+    """
+    Sampelt die Stacks der angegebenen Threads (Standard: alle außer dem
+    Sampler) und gibt sie im Collapsed-Format `a;b;c <anzahl>` zurück.
+    Blockiert für `seconds` – daher aus einem Hilfsthread aufrufen.
+    """
+    seconds = min(seconds, MAX_SAMPLE_SECONDS)
+    interval = max(interval, MIN_INTERVAL_SECONDS)
+    if not _sampling_lock.acquire(blocking=False):
+        raise RuntimeError("Es läuft bereits eine Sampling-Sitzung.")
+
+    try:
+        own_id = threading.get_ident()
+        counts: Counter = Counter()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (thread_ids is not None and thread_id not in thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                counts[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+    finally:
+        _sampling_lock.release()
+
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+# ----------------------------------------------------------------------
+# 2. Profiling der nächsten N Requests einer Route
+# ----------------------------------------------------------------------
+
+class RequestProfiler:
+    """Hält den Zustand einer Request-Profiling-Sitzung (ein Worker, eine Route)."""
+
+    def __init__(self):
+        self.route: Optional[str] = None   # None = nicht scharf geschaltet
+        self.remaining = 0
+        self.profile: Optional[cProfile.Profile] = None
+        self.profiled_requests = 0
+        self.result: Optional[pstats.Stats] = None
+        self._busy = False
+
+    def arm(self, route: str, count: int):
+        """Startet eine neue Sitzung; RuntimeError, solange gerade ein Request profiliert wird."""
+        if self._busy:
+            raise RuntimeError("Es wird gerade ein Request profiliert, bitte später erneut versuchen.")
+        self.profile = cProfile.Profile()
+        self.remaining = count
+        self.profiled_requests = 0
+        self.result = None
+        self.route = route
+
+    def dump(self) -> bytes:
+        """pstats-Dump (wie `Stats.dump_stats`), lesbar mit pstats/snakeviz."""
+        if self.result is None:
+            return b""
+        return marshal.dumps(self.result.stats)
+
+    def summary(self, limit: int = 40) -> str:
+        if self.result is None:
+            return ""
+        buffer = io.StringIO()
+        self.result.stream = buffer
+        self.result.sort_stats("cumulative").print_stats(limit)
+        return buffer.getvalue()
+
+    def status(self) -> dict:
+        return {
+            "route": self.route,
+            "remaining": self.remaining,
+            "profiled_requests": self.profiled_requests,
+            "result_available": self.result is not None,
+        }
+
+
+request_profiler = RequestProfiler()
+
+
+class ProfilerMiddleware:
+    """
+    Aktiviert cProfile für passende Requests, solange eine Sitzung scharf ist.
+    Requests werden nacheinander profiliert; während ein Request läuft,
+    erfasst cProfile auch parallel laufende Tasks desselben Event-Loops.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profiler = request_profiler
+        if profiler.route is None or profiler._busy or scope["type"] != "http" or scope["path"] != profiler.route:
+            await self.app(scope, receive, send)
+            return
+
+        # Lokale Referenz: ein erneutes arm() darf das laufende Profil nicht austauschen
+        profile = profiler.profile
+        try:
+            profile.enable()
+        except ValueError:
+            # Ein anderer Profiler (z.B. sys.setprofile eines Debuggers) ist aktiv: ohne Profil bedienen
+            await self.app(scope, receive, send)
+            return
+
+        profiler._busy = True
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.disable()
+            profiler._busy = False
+            # Nur zählen, wenn die Sitzung noch dieselbe ist
+            if profile is profiler.profile:
+                profiler.profiled_requests += 1
+                profiler.remaining -= 1
+                if profiler.remaining <= 0:
+                    profiler.result = pstats.Stats(profile)
+                    profiler.profile = None
+                    profiler.route = None
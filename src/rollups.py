@@ -0,0 +1,288 @@
+import asyncio
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncSessionLocal
+from db_models import DailyProductSales, DailyRevenue, Order, OrderItem
+from functions import enrich_cart_item_prices
+
+# ----------------------------------------------------------------------
+# Inkrementelle Reporting-Rollups
+# Die Tabellen werden in derselben Transaktion wie die Bestellung
+# fortgeschrieben (Upsert), sodass das Reporting nie über `orders` und
+# `order_items` aggregieren muss.
+#
+# Sperren: Jeder Checkout hält bis zum Commit die Zeilensperre auf dem
+# DailyRevenue-Eintrag des Tages – Checkouts desselben Tages committen
+# damit nacheinander. Deshalb laufen die Upserts als letzter Schritt
+# direkt vor dem Commit (kurzes Sperrfenster), und die Konfigurationen
+# werden in fester Reihenfolge gesperrt, damit sich zwei Bestellungen
+# mit [A, B] und [B, A] nicht gegenseitig blockieren (Deadlock).
+# ----------------------------------------------------------------------
+
+def _config_key(item: Dict) -> tuple:
+    """Normalisiert die Konfiguration eines Artikels auf den Rollup-Schlüssel."""
+    return (
+        item.get("product_id", 1),
+        item.get("size") or "",
+        item.get("shape") or "",
+        item.get("filling") or "",
+    )
+
+
+async def _upsert(db: AsyncSession, model, values: Dict, key_columns: List[str], add_columns: List[str]):
+    """
+    Addiert `add_columns` auf die Zeile mit den Schlüsselwerten bzw. legt sie an.
+    MySQL und SQLite in einem Statement (ON DUPLICATE KEY / ON CONFLICT),
+    andere Dialekte per UPDATE und – falls keine Zeile getroffen – INSERT.
+    """
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(values)
+        await db.execute(stmt.on_duplicate_key_update(
+            {col: table.c[col] + stmt.inserted[col] for col in add_columns}
+        ))
+        return
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table).values(values)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={col: table.c[col] + stmt.excluded[col] for col in add_columns},
+        ))
+        return
+
+    add = (
+        update(table)
+        .where(and_(*(table.c[col] == values[col] for col in key_columns)))
+        .values({col: table.c[col] + values[col] for col in add_columns})
+    )
+    if (await db.execute(add)).rowcount:
+        return
+    try:
+        # Savepoint: legt eine parallele Bestellung die Zeile zeitgleich an,
+        # bleibt die äußere Transaktion nutzbar und es wird doch addiert
+        async with db.begin_nested():
+            await db.execute(table.insert().values(values))
+    except IntegrityError:
+        await db.execute(add)
+
+
+async def apply_order_to_rollups(db: AsyncSession, order_date: datetime, cart_items: List[Dict], total_amount: float):
+    """
+    Schreibt eine Bestellung in die Rollup-Tabellen fort.
+    Erwartet angereicherte Warenkorb-Items (siehe enrich_cart_item_prices).
+    Kein Commit: der Aufrufer bestimmt die Transaktion.
+    """
+    day = order_date.date()
+
+    # Gleiche Konfigurationen innerhalb einer Bestellung vorab zusammenfassen
+    per_config: Dict[tuple, List[float]] = {}
+    for item in cart_items:
+        bucket = per_config.setdefault(_config_key(item), [0, 0.0])
+        bucket[0] += item.get("quantity", 1)
+        bucket[1] += item.get("total_item_price", 0.0)
+
+    # Sortiert: gleiche Sperrreihenfolge in allen parallelen Transaktionen
+    for (product_id, size, shape, filling), (quantity, revenue) in sorted(per_config.items()):
+        await _upsert(
+            db,
+            DailyProductSales,
+            {
+                "day": day,
+                "product_id": product_id,
+                "size": size,
+                "shape": shape,
+                "filling": filling,
+                "quantity": quantity,
+                "revenue": round(revenue, 2),
+            },
+            key_columns=["day", "product_id", "size", "shape", "filling"],
+            add_columns=["quantity", "revenue"],
+        )
+
+    await _upsert(
+        db,
+        DailyRevenue,
+        {"day": day, "order_count": 1, "revenue": round(total_amount, 2)},
+        key_columns=["day"],
+        add_columns=["order_count", "revenue"],
+    )
+
+
+# ----------------------------------------------------------------------
+# Lesen (Reporting) – greift ausschließlich auf die Rollups zu
+# ----------------------------------------------------------------------
+
+async def fetch_daily_report(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> Dict:
+    """Liefert Tagesumsätze und Tagesmengen pro Konfiguration im Zeitraum [start, end]."""
+    revenue_stmt = select(DailyRevenue).order_by(DailyRevenue.day)
+    sales_stmt = select(DailyProductSales).order_by(
+        DailyProductSales.day,
+        DailyProductSales.product_id,
+        DailyProductSales.size,
+        DailyProductSales.shape,
+        DailyProductSales.filling,
+    )
+    if start:
+        revenue_stmt = revenue_stmt.filter(DailyRevenue.day >= start)
+        sales_stmt = sales_stmt.filter(DailyProductSales.day >= start)
+    if end:
+        revenue_stmt = revenue_stmt.filter(DailyRevenue.day <= end)
+        sales_stmt = sales_stmt.filter(DailyProductSales.day <= end)
+
+    days: Dict[str, Dict] = {}
+    for row in (await db.execute(revenue_stmt)).scalars():
+        days[row.day.isoformat()] = {
+            "day": row.day.isoformat(),
+            "order_count": row.order_count,
+            "revenue": round(float(row.revenue), 2),
+            "products": [],
+        }
+
+    for row in (await db.execute(sales_stmt)).scalars():
+        entry = days.setdefault(row.day.isoformat(), {
+            "day": row.day.isoformat(), "order_count": 0, "revenue": 0.0, "products": [],
+        })
+        entry["products"].append({
+            "product_id": row.product_id,
+            "size": row.size,
+            "shape": row.shape,
+            "filling": row.filling,
+            "quantity": row.quantity,
+            "revenue": round(float(row.revenue), 2),
+        })
+
+    return {"days": list(days.values())}
+
+
+# ----------------------------------------------------------------------
+# Neuaufbau und Verifikation aus den Rohdaten
+# ----------------------------------------------------------------------
+
+def _as_date(value) -> date:
+    """SQLite liefert func.date() als String, MySQL als date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+async def _aggregate_from_orders(db: AsyncSession):
+    """Berechnet die Rollups vollständig aus `orders` und `order_items`."""
+    order_day = func.date(Order.order_date)
+
+    revenue_rows = await db.execute(
+        select(order_day, func.count(Order.id), func.sum(Order.total_amount)).group_by(order_day)
+    )
+    revenue = {
+        _as_date(day): (count, round(float(total or 0), 2))
+        for day, count, total in revenue_rows
+    }
+
+    # Umsatz pro Position: der beim Checkout gespeicherte Positionspreis. Nur ältere
+    # Positionen ohne line_total werden mit den heutigen Preisregeln nachgerechnet.
+    sales: Dict[tuple, List[float]] = {}
+    item_rows = await db.execute(
+        select(
+            order_day, OrderItem.product_id, OrderItem.size, OrderItem.shape, OrderItem.filling,
+            OrderItem.quantity, OrderItem.line_total,
+        )
+        .join(Order, OrderItem.order_id == Order.id)
+    )
+    for day, product_id, size, shape, filling, quantity, line_total in item_rows:
+        item = {"product_id": product_id, "size": size, "shape": shape, "filling": filling, "quantity": quantity}
+        if line_total is None:
+            line_total = enrich_cart_item_prices(item)["total_item_price"]
+        bucket = sales.setdefault((_as_date(day),) + _config_key(item), [0, 0.0])
+        bucket[0] += quantity
+        bucket[1] += float(line_total)
+
+    return revenue, {key: (qty, round(rev, 2)) for key, (qty, rev) in sales.items()}
+
+
+async def _read_rollups(db: AsyncSession):
+    revenue = {
+        row.day: (row.order_count, round(float(row.revenue), 2))
+        for row in (await db.execute(select(DailyRevenue))).scalars()
+    }
+    sales = {
+        (row.day, row.product_id, row.size, row.shape, row.filling): (row.quantity, round(float(row.revenue), 2))
+        for row in (await db.execute(select(DailyProductSales))).scalars()
+    }
+    return revenue, sales
+
+
+async def rebuild_rollups():
+    """
+    Löscht die Rollups und berechnet sie vollständig neu.
+    Nicht parallel zu laufenden Checkouts ausführen (Shop vorher stoppen bzw.
+    Wartungsfenster): deren Upserts addieren auf Zeilen, die hier gelöscht und
+    aus einem älteren Stand neu geschrieben werden – die Bestellungen fehlten dann.
+    """
+    async with AsyncSessionLocal() as db:
+        revenue, sales = await _aggregate_from_orders(db)
+
+        await db.execute(delete(DailyProductSales))
+        await db.execute(delete(DailyRevenue))
+
+        if revenue:
+            await db.execute(DailyRevenue.__table__.insert(), [
+                {"day": day, "order_count": count, "revenue": total}
+                for day, (count, total) in revenue.items()
+            ])
+        if sales:
+            await db.execute(DailyProductSales.__table__.insert(), [
+                {
+                    "day": day, "product_id": product_id, "size": size, "shape": shape,
+                    "filling": filling, "quantity": qty, "revenue": rev,
+                }
+                for (day, product_id, size, shape, filling), (qty, rev) in sales.items()
+            ])
+
+        await db.commit()
+        print(f"✅ Rollups neu aufgebaut: {len(revenue)} Tage, {len(sales)} Konfigurationen.")
+
+
+async def verify_rollups() -> bool:
+    """Vergleicht die gespeicherten Rollups mit einer Neuberechnung (ohne zu schreiben)."""
+    async with AsyncSessionLocal() as db:
+        expected_revenue, expected_sales = await _aggregate_from_orders(db)
+        stored_revenue, stored_sales = await _read_rollups(db)
+
+    differences = 0
+    for name, expected, stored in (
+        ("Tagesumsatz", expected_revenue, stored_revenue),
+        ("Tagesmengen", expected_sales, stored_sales),
+    ):
+        for key in sorted(set(expected) | set(stored), key=str):
+            if expected.get(key) != stored.get(key):
+                differences += 1
+                print(f"❌ {name} {key}: erwartet {expected.get(key)}, gespeichert {stored.get(key)}")
+
+    if differences:
+        print(f"Rollup-Prüfung: {differences} Abweichung(en) gefunden.")
+    else:
+        print("✅ Rollup-Prüfung: keine Abweichungen.")
+    return differences == 0
+
+
+# Aufruf: python rollups.py rebuild | verify
+# rebuild nur bei gestopptem Shop (siehe rebuild_rollups); verify ist jederzeit möglich
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    if command == "rebuild":
+        asyncio.run(rebuild_rollups())
+    elif command == "verify":
+        sys.exit(0 if asyncio.run(verify_rollups()) else 1)
+    else:
+        print("Verwendung: python rollups.py [rebuild|verify]")
+        sys.exit(2)
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import os
+import sys
+
+import uvicorn
+
+# ----------------------------------------------------------------------
+# Produktions-Start des Brownie-Shops
+# - mehrere Worker-Prozesse (je ein Event-Loop und Bildverarbeitungs-Pool)
+# - optional uvloop / httptools, falls installiert (uvicorn[standard])
+# - Datenbank-Schema einmalig im Master vorbereiten, bevor Worker starten
+# - Graceful Shutdown: laufende Requests werden bis zum Timeout beendet,
+#   danach schließt der Lifespan Journal, Bild-Pool und DB-Engine
+#
+# Aufruf (aus src/):
+#   python serve.py --workers 4 --loop uvloop --http httptools
+# ----------------------------------------------------------------------
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Brownie-Shop-Server starten.")
+    parser.add_argument("--host", default=os.environ.get("SHOP_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SHOP_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SHOP_WORKERS", "1")))
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default=os.environ.get("SHOP_LOOP", "auto"))
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default=os.environ.get("SHOP_HTTP", "auto"))
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Sekunden, die laufende Requests beim Herunterfahren noch erhalten")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Keep-Alive-Timeout in Sekunden")
+    parser.add_argument("--image-pool-size", type=int,
+                        help="Prozesse pro Worker für /upload (Standard: CPU-Kerne / Worker, 0 = Thread)")
+    parser.add_argument("--reset-db", action="store_true",
+                        help="ALLE Tabellen vor dem Start löschen und neu anlegen (nur Entwicklung)")
+    parser.add_argument("--reload", action="store_true", help="Auto-Reload für die Entwicklung (nur 1 Worker)")
+    return parser.parse_args()
+
+
+async def _prepare_database(reset: bool):
+    from db import engine, prepare_database, reset_db
+
+    if reset:
+        await reset_db()
+    await prepare_database()
+    # Verbindungen nicht an die Worker-Prozesse vererben
+    await engine.dispose()
+
+
+def main():
+    args = parse_args()
+
+    if args.workers < 1:
+        sys.exit("--workers muss mindestens 1 sein.")
+    if args.reload and args.workers > 1:
+        sys.exit("--reload ist nur mit einem Worker möglich.")
+    if os.environ.get("SHOP_ORDER_WRITE_BEHIND") == "1" and args.workers > 1:
+        # Das Order-Journal vergibt Bestell-IDs lokal und verträgt nur einen schreibenden Prozess
+        sys.exit("SHOP_ORDER_WRITE_BEHIND=1 ist nur mit --workers 1 möglich.")
+
+    # Von den Worker-Prozessen (image_pool.py) ausgewertet
+    os.environ["SHOP_WORKERS"] = str(args.workers)
+    if args.image_pool_size is not None:
+        os.environ["SHOP_IMAGE_POOL_SIZE"] = str(args.image_pool_size)
+
+    # Schema und Seed einmal vorab, damit die Worker nur noch "nichts zu tun" feststellen
+    asyncio.run(_prepare_database(args.reset_db))
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=args.loop,
+        http=args.http,
+        reload=args.reload,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
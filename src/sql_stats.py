@@ -0,0 +1,164 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+import timing
+
+# ----------------------------------------------------------------------
+# SQL-Abfragestatistik und Slow-Query-Log
+# Ersetzt das dauerhafte echo=True: pro Request werden Anzahl und
+# kumulierte Dauer der Statements (plus COMMIT/ROLLBACK-Zeit) gezählt (request.state.sql_stats,
+# Server-Timing-Stage "db", /metrics). Langsame Statements werden ohne
+# Parameterwerte protokolliert; auffällig viele Abfragen pro Request
+# (typisch für N+1 über ORM-Relationships) erzeugen eine Warnung.
+# ----------------------------------------------------------------------
+
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SHOP_SLOW_QUERY_MS", "200")) / 1000
+QUERY_COUNT_WARNING = int(os.environ.get("SHOP_QUERY_COUNT_WARNING", "20"))
+
+
+class QueryStats:
+    """Anzahl der SQL-Statements eines Requests und kumulierte DB-Zeit (inkl. COMMIT/ROLLBACK)."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("shop_query_stats", default=None)
+
+# Summen pro (Methode, Route) für /metrics – GET und POST /checkout getrennt
+_route_queries: Dict[Tuple[str, str], int] = {}
+_route_seconds: Dict[Tuple[str, str], float] = {}
+_route_requests: Dict[Tuple[str, str], int] = {}
+
+
+def _account(elapsed: float, count_statement: bool = True):
+    stats = _current_stats.get()
+    if stats is not None:
+        if count_statement:
+            stats.count += 1
+        stats.seconds += elapsed
+    timing.record("db", elapsed)
+
+
+# Eine Verbindung führt immer nur ein Statement gleichzeitig aus: ein Startwert pro Verbindung
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["shop_query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("shop_query_start")
+    _account(elapsed)
+
+    if elapsed >= SLOW_QUERY_THRESHOLD:
+        # Nur das Statement mit Platzhaltern ausgeben – gebundene Werte (E-Mail,
+        # Adresse, ...) werden nicht protokolliert
+        if executemany:
+            redacted = f"{len(parameters)} Parametersätze ausgeblendet"
+        else:
+            redacted = f"{len(parameters or ())} Parameter ausgeblendet"
+        print(f"[SLOW SQL] {elapsed * 1000:.1f} ms ({redacted}): {' '.join(statement.split())}")
+
+
+def _handle_error(context):
+    # Fehlgeschlagene Statements: after_cursor_execute kommt nicht, Startwert hier abräumen
+    conn = context.connection
+    started = conn.info.pop("shop_query_start", None) if conn is not None else None
+    if started is not None:
+        _account(time.perf_counter() - started)
+
+
+def _timed_transaction_end(original, label: str):
+    """
+    COMMIT/ROLLBACK laufen über dbapi_connection.commit()/rollback(), nicht über
+    einen Cursor – die Cursor-Hooks sehen sie nicht. Gerade der COMMIT (fsync
+    der DB) ist im Checkout oft der größte Anteil, daher hier extra messen.
+    """
+    def wrapper(dbapi_connection):
+        started = time.perf_counter()
+        try:
+            return original(dbapi_connection)
+        finally:
+            elapsed = time.perf_counter() - started
+            _account(elapsed, count_statement=False)
+            if elapsed >= SLOW_QUERY_THRESHOLD:
+                print(f"[SLOW SQL] {elapsed * 1000:.1f} ms: {label}")
+    return wrapper
+
+
+def install_query_stats(engine):
+    """Registriert die Zähl-Hooks an der (synchronen Seite der) Async-Engine."""
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    # do_commit/do_rollback sind die Dialekt-Hooks für die DBAPI-Aufrufe (Instanz-Attribut überschreiben)
+    dialect = sync_engine.dialect
+    dialect.do_commit = _timed_transaction_end(dialect.do_commit, "COMMIT")
+    dialect.do_rollback = _timed_transaction_end(dialect.do_rollback, "ROLLBACK")
+
+
+class QueryStatsMiddleware:
+    """Stellt pro HTTP-Request einen frischen Zähler bereit und wertet ihn danach aus."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        # Über request.state.sql_stats für Endpunkte und Logging erreichbar
+        scope.setdefault("state", {})["sql_stats"] = stats
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_stats.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            key = (scope.get("method", ""), route)
+            _route_requests[key] = _route_requests.get(key, 0) + 1
+            _route_queries[key] = _route_queries.get(key, 0) + stats.count
+            _route_seconds[key] = _route_seconds.get(key, 0.0) + stats.seconds
+
+            if stats.count > QUERY_COUNT_WARNING:
+                print(
+                    f"⚠️  {scope.get('method')} {route}: {stats.count} SQL-Abfragen in einem Request "
+                    f"({stats.seconds * 1000:.1f} ms) – mögliches N+1-Problem."
+                )
+
+
+def render_metrics() -> str:
+    """SQL-Zähler pro Methode und Route im Prometheus-Textformat."""
+    lines = [
+        "# HELP shop_sql_queries_total Anzahl SQL-Statements pro Methode und Route.",
+        "# TYPE shop_sql_queries_total counter",
+    ]
+    lines += [
+        f'shop_sql_queries_total{{method="{method}",route="{route}"}} {count}'
+        for (method, route), count in sorted(_route_queries.items())
+    ]
+    lines += [
+        "# HELP shop_sql_seconds_total Kumulierte Datenbankzeit pro Methode und Route.",
+        "# TYPE shop_sql_seconds_total counter",
+    ]
+    lines += [
+        f'shop_sql_seconds_total{{method="{method}",route="{route}"}} {seconds:.6f}'
+        for (method, route), seconds in sorted(_route_seconds.items())
+    ]
+    lines += [
+        "# HELP shop_sql_requests_total Ausgewertete Requests pro Methode und Route.",
+        "# TYPE shop_sql_requests_total counter",
+    ]
+    lines += [
+        f'shop_sql_requests_total{{method="{method}",route="{route}"}} {count}'
+        for (method, route), count in sorted(_route_requests.items())
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,236 @@
+import inspect
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+# ----------------------------------------------------------------------
+# Stage-Timing pro Request
+# Messpunkte im Code (`with stage("decode"):` bzw. `@timed("pricing")`)
+# schreiben in den Timer des aktuellen Requests. Die Middleware gibt die
+# Werte als `Server-Timing`-Header aus und sammelt sie in Histogrammen
+# pro Methode und Route (GET und POST /checkout getrennt), die unter
+# /metrics im Prometheus-Textformat abrufbar sind.
+# Ist SHOP_TIMING nicht gesetzt, wird keine Middleware installiert und
+# jeder Messpunkt kostet nur einen ContextVar-Lookup.
+# ----------------------------------------------------------------------
+
+TIMING_ENABLED = os.environ.get("SHOP_TIMING", "0") == "1"
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimer:
+    """Sammelt die Stage-Dauern eines einzelnen Requests."""
+    __slots__ = ("stages", "mark")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.mark = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+_current: ContextVar[Optional[RequestTimer]] = ContextVar("shop_request_timer", default=None)
+_NOOP = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: RequestTimer, name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name: str):
+    """Kontextmanager, der die Dauer des Blocks der Stage `name` zuschlägt."""
+    timer = _current.get()
+    if timer is None:
+        return _NOOP
+    return _Stage(timer, name)
+
+
+def timed(name: str):
+    """Decorator-Variante von stage() für synchrone und asynchrone Funktionen."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def lap(name: str):
+    """Verbucht die Zeit seit der letzten Marke (z.B. Eintritt in die App) als Stage."""
+    timer = _current.get()
+    if timer is None:
+        return
+    now = time.perf_counter()
+    timer.add(name, now - timer.mark)
+    timer.mark = now
+
+
+def record(name: str, seconds: float):
+    """Verbucht eine extern gemessene Dauer für den aktuellen Request."""
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+def run_timed(func, *args) -> Tuple[object, Dict[str, float]]:
+    """
+    Führt `func` mit eigenem Timer aus und gibt (Ergebnis, Stage-Dauern) zurück.
+    Für Code in anderen Prozessen (Bild-Pool), deren Stages der Aufrufer
+    anschließend per record() dem Request zuschlägt.
+    """
+    timer = RequestTimer()
+    token = _current.set(timer)
+    try:
+        return func(*args), timer.stages
+    finally:
+        _current.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Histogramme und Prometheus-Export
+# ----------------------------------------------------------------------
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+_histograms: Dict[Tuple[str, str, str], Histogram] = {}
+
+
+def observe(method: str, route: str, stage_name: str, seconds: float):
+    key = (method, route, stage_name)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(seconds)
+
+
+def render_metrics() -> str:
+    """Gibt alle Histogramme im Prometheus-Textformat (0.0.4) aus."""
+    lines = [
+        "# HELP shop_request_stage_seconds Dauer einzelner Verarbeitungsschritte pro Methode und Route.",
+        "# TYPE shop_request_stage_seconds histogram",
+    ]
+    for (method, route, stage_name), histogram in sorted(_histograms.items()):
+        labels = f'method="{method}",route="{route}",stage="{stage_name}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'shop_request_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'shop_request_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"shop_request_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"shop_request_stage_seconds_count{{{labels}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# ASGI-Middlewares
+# ----------------------------------------------------------------------
+
+def _route_label(scope) -> str:
+    # FastAPI legt die gematchte Route im Scope ab; Pfad-Templates halten die
+    # Label-Kardinalität klein (z.B. /cart/update/{session_item_id})
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class TimingMiddleware:
+    """Äußerste Middleware: startet den Timer und setzt den Server-Timing-Header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current.set(timer)
+        start = timer.mark
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                # Zeit zwischen innerer Antwort und hier = Session-Cookie signieren
+                timer.add("session_save", now - timer.mark)
+                timer.add("total", now - start)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", ", ".join(
+                    f"{name};dur={seconds * 1000:.2f}" for name, seconds in timer.stages.items()
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            method, route = scope.get("method", ""), _route_label(scope)
+            for name, seconds in timer.stages.items():
+                observe(method, route, name, seconds)
+
+
+class SessionTimingBoundary:
+    """
+    Wird direkt innerhalb der SessionMiddleware installiert und markiert die
+    Übergänge, damit Laden/Signieren des Session-Cookies messbar werden.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        timer = _current.get()
+        if timer is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lap("session_load")
+
+        async def send_with_mark(message):
+            if message["type"] == "http.response.start":
+                timer.mark = time.perf_counter()
+            await send(message)
+
+        await self.app(scope, receive, send_with_mark)
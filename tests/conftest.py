@@ -0,0 +1,39 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Die Module liegen flach in src/ und werden von dort aus importiert
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+# Vor dem ersten Import von db.py setzen: Tests laufen gegen eine temporäre SQLite-Datei
+_TEST_DIR = tempfile.mkdtemp(prefix="shop-tests-")
+os.environ.setdefault("SHOP_DATABASE_URL", f"sqlite+aiosqlite:///{_TEST_DIR}/test.db")
+
+
+def run(coro):
+    """Führt eine Koroutine aus und schließt danach den Verbindungspool (an den Event-Loop gebunden)."""
+    from db import engine
+
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(wrapper())
+
+
+@pytest.fixture
+def fresh_db():
+    """Leere Tabellen mit den Seed-Produkten."""
+    from db import reset_db, seed_initial_data
+
+    async def prepare():
+        await reset_db()
+        await seed_initial_data()
+
+    run(prepare())
@@ -0,0 +1,138 @@
+import asyncio
+import contextlib
+import re
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+
+from conftest import SRC_DIR, run
+from db import AsyncSessionLocal
+from db_models import Order
+from idempotency import checkout_keys
+
+# main.py bindet Templates und statische Verzeichnisse relativ zu src/
+with contextlib.chdir(SRC_DIR):
+    import main
+
+CHECKOUT_FORM = {
+    "name": "Erika Muster", "email": "erika@example.com", "address": "Teststraße 1",
+    "zip": "12345", "payment_method": "rechnung",
+}
+BROWNIE = {"size": "mittel", "shape": "herz", "quantity": "2"}
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://testserver")
+
+
+async def open_checkout(shop: httpx.AsyncClient) -> str:
+    """Legt einen Brownie in den Warenkorb und liefert den Idempotenz-Schlüssel der Checkout-Seite."""
+    await shop.post("/order", data=BROWNIE)
+    page = await shop.get("/checkout")
+    return re.search(r'name="idempotency_key" value="([0-9a-f]+)"', page.text).group(1)
+
+
+async def submit(shop: httpx.AsyncClient, key: str) -> httpx.Response:
+    return await shop.post("/checkout", data=dict(CHECKOUT_FORM, idempotency_key=key))
+
+
+def order_id_of(response: httpx.Response) -> int:
+    assert response.status_code == 303, response.text
+    return int(response.headers["location"].split("order_id=")[1])
+
+
+async def order_count() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(Order))).scalar()
+
+
+@pytest.fixture(autouse=True)
+def shop_environment(monkeypatch):
+    monkeypatch.chdir(SRC_DIR)
+    checkout_keys._entries.clear()
+    yield
+    checkout_keys._entries.clear()
+
+
+def test_repeated_submit_returns_original_order(fresh_db):
+    async def scenario():
+        async with client() as shop:
+            key = await open_checkout(shop)
+            first = order_id_of(await submit(shop, key))
+            # Doppelklick nach der ersten Antwort: Warenkorb ist bereits leer
+            second = order_id_of(await submit(shop, key))
+        return first, second, await order_count()
+
+    assert run(scenario()) == (1, 1, 1)
+
+
+def test_retry_after_lost_response_returns_original_order(fresh_db):
+    async def scenario():
+        async with client() as shop:
+            key = await open_checkout(shop)
+            cookies_before = dict(shop.cookies)
+            first = order_id_of(await submit(shop, key))
+            # Antwort kam nie an: der Browser sendet noch den alten Session-Cookie
+            shop.cookies.clear()
+            shop.cookies.update(cookies_before)
+            second = order_id_of(await submit(shop, key))
+        return first, second, await order_count()
+
+    assert run(scenario()) == (1, 1, 1)
+
+
+def test_concurrent_submits_create_one_order(fresh_db):
+    async def scenario():
+        async with client() as shop:
+            key = await open_checkout(shop)
+            # Erste Verbindung vorab öffnen: SQLAlchemys First-Connect-Hook ist nicht nebenläufig nutzbar
+            await order_count()
+            responses = await asyncio.gather(*(submit(shop, key) for _ in range(3)))
+        return {order_id_of(response) for response in responses}, await order_count()
+
+    assert run(scenario()) == ({1}, 1)
+
+
+def test_integrity_error_confirms_the_existing_order(fresh_db, monkeypatch):
+    real_find_order_id = main.find_order_id
+    calls = []
+
+    async def miss_first_lookup(db, key):
+        # Simuliert die parallele Absendung, die zwischen Prüfung und INSERT committet
+        calls.append(key)
+        if len(calls) == 1:
+            return None
+        return await real_find_order_id(db, key)
+
+    async def scenario():
+        async with client() as shop:
+            key = await open_checkout(shop)
+            cookies_before = dict(shop.cookies)
+            first = order_id_of(await submit(shop, key))
+            checkout_keys._entries.clear()
+            monkeypatch.setattr(main, "find_order_id", miss_first_lookup)
+            shop.cookies.clear()
+            shop.cookies.update(cookies_before)
+            second = order_id_of(await submit(shop, key))
+        return first, second, await order_count()
+
+    assert run(scenario()) == (1, 1, 1)
+
+
+def test_changed_cart_does_not_reuse_old_key(fresh_db):
+    async def scenario():
+        async with client() as shop:
+            key = await open_checkout(shop)
+            cookies_before = dict(shop.cookies)
+            order_id_of(await submit(shop, key))
+            # Antwort verloren, dann Warenkorb geändert und altes Formular erneut abgeschickt
+            shop.cookies.clear()
+            shop.cookies.update(cookies_before)
+            await shop.post("/order", data=BROWNIE)
+            stale = await submit(shop, key)
+            new_key = re.search(r'name="idempotency_key" value="([0-9a-f]+)"', (await shop.get("/checkout")).text).group(1)
+            second = order_id_of(await submit(shop, new_key))
+        return stale.status_code, new_key != key, second, await order_count()
+
+    assert run(scenario()) == (409, True, 2, 2)
@@ -0,0 +1,24 @@
+import pytest
+
+import compression
+from compression import choose_encoding
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("br;q=0.1, gzip;q=1", "gzip"),
+    ("gzip;q=0.5, br;q=0.5", "br"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("gzip;q=0, *;q=0.5", "br"),
+    ("identity", None),
+    ("", None),
+])
+def test_choose_encoding_prefers_highest_quality(monkeypatch, header, expected):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, *;q=0.1") == "gzip"
+    assert choose_encoding("br") is None
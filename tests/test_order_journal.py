@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import run
+from db import AsyncSessionLocal
+from db_models import Order, OrderItem
+from idempotency import checkout_keys
+import order_journal
+from order_journal import OrderJournal, persist_order_records
+
+
+def make_record(order_id=None, email="kunde@example.com", key=None, name="Erika Muster"):
+    record = {
+        "order_date": "2026-03-02T10:00:00",
+        "customer": {"name": name, "email": email, "address": "Teststraße 1, 12345"},
+        "total_amount": 25.0,
+        "items": [{
+            "product_id": 1, "quantity": 2, "size": "mittel", "shape": "herz",
+            "filling": "Nougat", "toppings": "", "total_item_price": 11.8,
+        }],
+        "idempotency_key": key,
+    }
+    if order_id is not None:
+        record["order_id"] = order_id
+    return record
+
+
+@pytest.fixture
+def journal_paths(tmp_path):
+    return str(tmp_path / "journal.jsonl"), str(tmp_path / "journal.dead.jsonl")
+
+
+async def order_ids():
+    async with AsyncSessionLocal() as db:
+        return sorted((await db.execute(select(Order.id))).scalars())
+
+
+def test_recovery_ignores_torn_last_line(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+    with open(path, "wb") as journal_file:
+        for order_id in (1, 2):
+            journal_file.write(json.dumps(make_record(order_id, email=f"k{order_id}@example.com")).encode() + b"\n")
+        journal_file.write(b'{"order_id": 3, "custo')
+
+    async def scenario():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        await journal.stop()
+        return await order_ids()
+
+    assert run(scenario()) == [1, 2]
+    assert os.path.getsize(path) == 0
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_submit_persists_and_truncates(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+
+    async def scenario():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        ids = await asyncio.gather(*(journal.submit(make_record(email=f"k{i}@example.com")) for i in range(5)))
+        await journal.stop()
+        return ids, await order_ids()
+
+    ids, stored = run(scenario())
+    assert sorted(ids) == stored == [1, 2, 3, 4, 5]
+    assert os.path.getsize(path) == 0
+
+
+def test_submit_returns_existing_id_for_known_key(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+
+    async def scenario():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        ids = await asyncio.gather(*(journal.submit(make_record(key="doppelklick-1")) for _ in range(3)))
+        await journal.stop()
+        return ids, await order_ids()
+
+    ids, stored = run(scenario())
+    assert ids == [1, 1, 1]
+    assert stored == [1]
+
+
+def test_persist_skips_existing_ids_and_duplicate_keys(fresh_db):
+    async def scenario():
+        await persist_order_records([make_record(1, key="k-1")])
+        await persist_order_records([
+            make_record(1, key="k-1"),                       # nach Absturz erneut abgespielt
+            make_record(2, email="b@example.com", key="k-1"),  # gleicher Schlüssel, andere ID
+            make_record(3, email="c@example.com", key="k-3"),
+            make_record(4, email="d@example.com", key="k-3"),  # Duplikat im selben Stapel
+        ])
+        async with AsyncSessionLocal() as db:
+            items = (await db.execute(select(func.count()).select_from(OrderItem))).scalar()
+        return await order_ids(), items
+
+    assert run(scenario()) == ([1, 3], 2)
+
+
+def test_submit_rejects_values_beyond_column_limits(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+
+    async def scenario():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        try:
+            with pytest.raises(ValueError):
+                await journal.submit(make_record(name="x" * 101))
+        finally:
+            await journal.stop()
+
+    run(scenario())
+    assert os.path.getsize(path) == 0
+
+
+def test_failed_fsync_is_not_replayed(fresh_db, journal_paths, monkeypatch):
+    path, dead_path = journal_paths
+    real_fsync = os.fsync
+
+    def failing_fsync(fd):
+        raise OSError("EIO")
+
+    async def first_run():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        monkeypatch.setattr(order_journal.os, "fsync", failing_fsync)
+        try:
+            with pytest.raises(OSError):
+                await journal.submit(make_record(key="fsync-fehler"))
+        finally:
+            monkeypatch.setattr(order_journal.os, "fsync", real_fsync)
+        await journal.stop()
+
+    async def second_run():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        await journal.stop()
+        return await order_ids()
+
+    run(first_run())
+    assert os.path.getsize(path) == 0
+    assert checkout_keys.get("fsync-fehler") is None
+    assert run(second_run()) == []
+
+
+def test_permanently_rejected_record_is_dead_lettered(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+    broken = make_record(2, email="kaputt@example.com")
+    del broken["items"][0]["product_id"]
+    with open(path, "wb") as journal_file:
+        for record in (make_record(1), broken, make_record(3, email="c@example.com")):
+            journal_file.write(json.dumps(record).encode() + b"\n")
+
+    async def scenario():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        await asyncio.wait_for(journal.stop(), timeout=10)
+        return await order_ids()
+
+    assert run(scenario()) == [1, 3]
+    with open(dead_path) as dead_file:
+        dead = [json.loads(line) for line in dead_file]
+    assert [entry["record"]["order_id"] for entry in dead] == [2]
+    assert os.path.getsize(path) == 0
+
+
+def test_second_journal_on_same_file_refuses_to_start(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+
+    async def scenario():
+        first = OrderJournal(path, dead_path)
+        await first.start()
+        try:
+            with pytest.raises(RuntimeError):
+                await OrderJournal(path, dead_path).start()
+        finally:
+            await first.stop()
+        # Nach dem Stoppen ist das Journal wieder frei
+        second = OrderJournal(path, dead_path)
+        await second.start()
+        await second.stop()
+
+    run(scenario())
+
+
+def test_replayed_id_of_other_order_is_dead_lettered(fresh_db, journal_paths):
+    path, dead_path = journal_paths
+    # Die ID 1 hat (z.B. ein zweiter Prozess) schon für eine andere Bestellung vergeben
+    run(persist_order_records([make_record(1, email="erster@example.com", key="k-a")]))
+    with open(path, "wb") as journal_file:
+        journal_file.write(json.dumps(make_record(1, email="zweiter@example.com", key="k-b")).encode() + b"\n")
+
+    async def scenario():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        await asyncio.wait_for(journal.stop(), timeout=10)
+        return await order_ids()
+
+    assert run(scenario()) == [1]
+    with open(dead_path) as dead_file:
+        dead = [json.loads(line) for line in dead_file]
+    assert [entry["record"]["idempotency_key"] for entry in dead] == ["k-b"]
+
+
+def test_stop_gives_up_when_database_stays_down(fresh_db, journal_paths, monkeypatch):
+    path, dead_path = journal_paths
+    monkeypatch.setattr(order_journal, "RETRY_DELAY", 0.01)
+
+    async def database_down(records):
+        raise OSError("Verbindung abgelehnt")
+
+    async def first_run():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        monkeypatch.setattr(order_journal, "persist_order_records", database_down)
+        await journal.submit(make_record(key="beim-herunterfahren"))
+        await asyncio.wait_for(journal.stop(timeout=0.2), timeout=5)
+
+    async def second_run():
+        journal = OrderJournal(path, dead_path)
+        await journal.start()
+        await journal.stop()
+        return await order_ids()
+
+    run(first_run())
+    monkeypatch.undo()
+    assert os.path.getsize(path) > 0
+    assert run(second_run()) == [1]
@@ -0,0 +1,96 @@
+from datetime import date
+
+import functions
+from conftest import run
+from db import AsyncSessionLocal
+from order_journal import persist_order_records
+from rollups import fetch_daily_report, rebuild_rollups, verify_rollups
+
+
+def make_order(order_id, day="2026-03-02", items=None, total=25.0):
+    return {
+        "order_id": order_id,
+        "order_date": f"{day}T10:00:00",
+        "customer": {"name": "Erika Muster", "email": f"k{order_id}@example.com", "address": "Teststraße 1, 12345"},
+        "total_amount": total,
+        "items": items or [{
+            "product_id": 1, "quantity": 2, "size": "mittel", "shape": "herz",
+            "filling": "Nougat", "toppings": "", "total_item_price": 11.8,
+        }],
+        "idempotency_key": None,
+    }
+
+
+async def daily_report():
+    async with AsyncSessionLocal() as db:
+        return await fetch_daily_report(db, date(2026, 3, 1), date(2026, 3, 31))
+
+
+def test_rebuild_keeps_historical_revenue_after_price_change(fresh_db, monkeypatch):
+    async def scenario():
+        await persist_order_records([make_order(1), make_order(2)])
+        before = await daily_report()
+        # Preiserhöhung nach den Bestellungen: der Neuaufbau nutzt die gespeicherten Positionspreise
+        monkeypatch.setattr(functions, "BASE_PRODUCT_PRICE", 9.90)
+        verified = await verify_rollups()
+        await rebuild_rollups()
+        return before, verified, await daily_report()
+
+    before, verified, after = run(scenario())
+    assert verified
+    assert after == before
+    assert before["days"][0]["products"][0]["revenue"] == 23.6
+
+
+def test_orders_of_one_day_add_up_per_configuration(fresh_db):
+    second_config = {
+        "product_id": 1, "quantity": 1, "size": "gross", "shape": "rund",
+        "filling": "", "toppings": "", "total_item_price": 8.9,
+    }
+
+    async def scenario():
+        await persist_order_records([make_order(1), make_order(2, total=30.0)])
+        await persist_order_records([make_order(3, items=[second_config], total=14.9)])
+        return await daily_report(), await verify_rollups()
+
+    report, verified = run(scenario())
+    assert verified
+    day = report["days"][0]
+    assert (day["order_count"], day["revenue"]) == (3, 69.9)
+    assert [(p["size"], p["quantity"], p["revenue"]) for p in day["products"]] == [
+        ("gross", 1, 8.9),
+        ("mittel", 4, 23.6),
+    ]
+
+
+def test_generic_dialect_falls_back_to_update_and_insert(fresh_db, monkeypatch):
+    from db import engine
+
+    # Weder MySQL noch SQLite: _upsert nimmt den UPDATE/INSERT-Weg mit Savepoint
+    monkeypatch.setattr(engine.sync_engine.dialect, "name", "generic")
+
+    async def scenario():
+        await persist_order_records([make_order(1)])
+        await persist_order_records([make_order(2, total=30.0)])
+        return await daily_report(), await verify_rollups()
+
+    report, verified = run(scenario())
+    assert verified
+    day = report["days"][0]
+    assert (day["order_count"], day["revenue"]) == (2, 55.0)
+    assert [(p["quantity"], p["revenue"]) for p in day["products"]] == [(4, 23.6)]
+
+
+def test_verify_reports_drifted_rollups(fresh_db):
+    from sqlalchemy import update
+
+    from db_models import DailyRevenue
+
+    async def scenario():
+        await persist_order_records([make_order(1)])
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(DailyRevenue).values(revenue=DailyRevenue.revenue + 1))
+            await db.commit()
+        return await verify_rollups()
+
+    assert run(scenario()) is False